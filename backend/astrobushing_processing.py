@@ -1,113 +1,102 @@
+import argparse
 import pandas as pd
-import os
 from pathlib import Path
-from database import Product, get_db
-
-def load_atrobushing_data():
-    """Load and process the AstroBushing spreadsheet into a DataFrame."""
-    # Get the path to the Excel file
-    base_dir = Path(__file__).parent
-    excel_file = base_dir / 'AtroBushing Torque Rod Automation.xlsx'
-    
-    if not excel_file.exists():
+from bulk_loader import bulk_load, format_report
+
+DEFAULT_WORKBOOK = Path(__file__).parent / 'AtroBushing Torque Rod Automation.xlsx'
+
+# Sheet column position -> the side pair its SKUs belong to. Position 0 holds c_to_c.
+SIDE_PAIRS = pd.DataFrame({
+    'column': [1, 2, 3, 4, 5],
+    'side_a': ['Straddle', 'Straddle', 'Taper', 'Straddle', 'Hollow'],
+    'side_b': ['Straddle', 'Taper', 'Taper', 'Hollow', 'Hollow'],
+})
+
+PRODUCT_COLUMNS = ['sku', 'c_to_c', 'side_a', 'side_b', 'vendor']
+
+
+def read_sheet(excel_file, sheet_name=0):
+    """Read the c_to_c column and the five side-pair columns of one sheet."""
+    if not Path(excel_file).exists():
         raise FileNotFoundError(f'Excel file not found at {excel_file}')
-    
-    # Read the Excel file
+
     df = pd.read_excel(
         excel_file,
         engine='openpyxl',
-        usecols=range(1,7),  # Read columns A through F (0-5)
-        sheet_name=0  # Read first sheet only
+        usecols=range(1, 7),  # c_to_c plus the five side-pair columns
+        sheet_name=sheet_name,
     )
-    # Clean column names - remove whitespace and convert to lowercase
-    df.columns = df.columns.str.strip().str.lower()
-    
-    # Remove any completely empty rows
+    # Remove any completely empty rows; columns are addressed by position from here on
     df = df.dropna(how='all')
-    
-    new_products = []
-    
-    # Iterate through each row in the DataFrame
-    for idx, row in df.iterrows():
-        for i in range(1, 6):
-            # Skip if cell is empty, NaN, or just whitespace
-            if pd.isna(row.iloc[i]) or str(row.iloc[i]).strip() == "":
-                continue
-            
-            side_a, side_b = get_sides(i)
-            # Create a new Product object
-            if ", " in str(row.iloc[i]):
-                for sku in str(row.iloc[i]).split(", "):
-                    product = Product(
-                        sku=sku,
-                        c_to_c=str(row.iloc[0]),
-                        side_a=side_a,
-                        side_b=side_b,
-                        vendor="AtroBushing"
-                    )
-                    new_products.append(product)
-                    # print(f"Created product: {product.sku} - {product.side_a} - {product.side_b} - {product.c_to_c}")
-            else:
-                product = Product(
-                    sku=str(row.iloc[i]),
-                    c_to_c=str(row.iloc[0]),
-                    side_a=side_a,
-                    side_b=side_b,
-                    vendor="AtroBushing"
-                )
-                new_products.append(product)
-                # print(f"Created product: {product.sku} - {product.side_a} - {product.side_b} - {product.c_to_c}")
-    
-    return new_products
-
-def get_sides(idx):
-    match idx:
-        case 1:
-            return "Straddle", "Straddle"
-        case 2:
-            return "Straddle", "Taper"
-        case 3:
-            return "Taper", "Taper"
-        case 4:
-            return "Straddle", "Hollow"
-        case 5:
-            return "Hollow", "Hollow"
-        case _:
-            return None, None  # default case
+    df.columns = range(df.shape[1])
+    return df
+
+
+def sheet_to_products(df):
+    """Turn one sheet into a product frame: one row per (c_to_c, side pair, SKU)."""
+    # One row per non-empty SKU cell, keeping the sheet row for ordering
+    cells = df.melt(
+        id_vars=[0], value_vars=list(SIDE_PAIRS['column']),
+        var_name='column', value_name='sku', ignore_index=False,
+    ).rename(columns={0: 'c_to_c'})
+    cells = cells.dropna(subset=['sku']).rename_axis('row').reset_index()
+
+    # Cells may list several comma-separated SKUs
+    cells['sku'] = cells['sku'].astype(str).str.split(',')
+    cells = cells.explode('sku')
+    cells['sku'] = cells['sku'].str.strip()
+    cells = cells[cells['sku'] != '']
+
+    products = cells.merge(SIDE_PAIRS, on='column', how='left')
+    products = products.sort_values(['row', 'column'], kind='stable')
+    products['c_to_c'] = products['c_to_c'].astype(str)
+    products['vendor'] = 'AtroBushing'
+    return products[PRODUCT_COLUMNS].reset_index(drop=True)
+
+
+def load_atrobushing_data(workbooks=(DEFAULT_WORKBOOK,), sheets=(0,)):
+    """Load every given sheet of every given workbook into one product frame."""
+    frames = [
+        sheet_to_products(read_sheet(workbook, sheet))
+        for workbook in workbooks
+        for sheet in sheets
+    ]
+    return pd.concat(frames, ignore_index=True)
+
 
 def save_products_to_db(products):
-    """Save the list of products to the database."""
-    db = next(get_db())  # Get database session
-    try:
-        # Add all products to the session
-        for product in products:
-            db.add(product)
-        # Commit the transaction
-        db.commit()
-        print(f"Successfully saved {len(products)} products to database")
-    except Exception as e:
-        # Rollback in case of error
-        db.rollback()
-        raise e
-    finally:
-        # Always close the session
-        db.close()
+    """Bulk load the product frame into the database in one transaction."""
+    report = bulk_load(products)
+    print(f"Successfully saved {report['inserted'] + report['updated']} products to database")
+    print(format_report(report))
+
+
+def sheet_name(value):
+    return int(value) if value.isdigit() else value
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load AstroBushing torque rod spreadsheets.')
+    parser.add_argument(
+        '--workbook', action='append', type=Path,
+        help='workbook to load; repeat for several (default: the bundled sheet)',
+    )
+    parser.add_argument(
+        '--sheet', action='append', type=sheet_name,
+        help='sheet name or index to load from each workbook; repeatable (default: 0)',
+    )
+    args = parser.parse_args()
+
     try:
         # Load products from Excel
-        products = load_atrobushing_data()
-        print(f"Successfully created {len(products)} product objects")
-        
-        # Print details of first few products
-        # for i, product in enumerate(products[:5]):
-        #     print(f"\nProduct {i + 1}:")
-        #     print(f"  SKU: {product.sku}")
-        #     print(f"  Side A: {product.side_a}")
-        #     print(f"  Side B: {product.side_b}")
-        
+        products = load_atrobushing_data(
+            workbooks=args.workbook or [DEFAULT_WORKBOOK],
+            sheets=args.sheet or [0],
+        )
+        print(f"Successfully created {len(products)} product rows")
+
         # Save to database
         save_products_to_db(products)
-        
+
     except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
@@ -0,0 +1,195 @@
+"""Scrape Automann torque rods over HTTP, without a browser.
+
+The wizard grid is filled from the site's own JSON calls: one listing a
+category's product tiles, one returning a product's grid rows keyed by the
+grid's col-ids. This backend logs in by posting the login form (or reuses a
+Selenium session's cookies) and fetches those endpoints concurrently on one
+pooled httpx client, returning the same records as scrape_products.
+
+The tile and grid endpoints, their paths and payload shapes are assumed:
+they have not been verified against the live site, and the responses in
+fixtures/automann_http were written to match them, not captured. Set
+AUTOMANN_TILES_PATH / AUTOMANN_GRID_PATH once the real ones are known. To
+run against the stub:
+
+    python fixtures/automann_stub_server.py --port 8766
+    AUTOMANN_URL=http://127.0.0.1:8766 AUTOMANN_USERNAME=demo AUTOMANN_PASSWORD=demo \\
+        python automann_http.py --no-upload
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+import lxml.html
+from dotenv import load_dotenv
+
+from automann_scrape_ import AUTOMANN_URL, CATEGORIES, CENTER_FIELDS, PINNED_FIELDS, category_scope
+from scrape_cdc import format_change_report, quarantine_entry, record_run
+
+load_dotenv()
+
+LOGIN_PATH = os.getenv('AUTOMANN_LOGIN_PATH', '/customer/account/login/')
+TILES_PATH = os.getenv('AUTOMANN_TILES_PATH', '/wizard/torquerods/products')
+GRID_PATH = os.getenv('AUTOMANN_GRID_PATH', '/wizard/torquerods/grid')
+DEFAULT_CONCURRENCY = 16
+REQUEST_TIMEOUT = 30
+
+
+class LoginError(Exception):
+    pass
+
+
+def cookies_from_driver(driver):
+    """Copy a logged-in Selenium session's cookies for the HTTP client."""
+    cookies = httpx.Cookies()
+    for cookie in driver.get_cookies():
+        cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+    return cookies
+
+
+def login_form(page):
+    """Return (action, fields) of the login form on `page`, hidden inputs included."""
+    tree = lxml.html.fromstring(page)
+    for form in tree.forms:
+        if 'login[username]' in form.fields:
+            return form.action, dict(form.fields)
+    raise LoginError('No login form on the login page')
+
+
+async def login(client):
+    """Log in by posting the site's login form, carrying its form key."""
+    username = os.getenv('AUTOMANN_USERNAME')
+    password = os.getenv('AUTOMANN_PASSWORD')
+    if not username or not password:
+        raise ValueError('Please set AUTOMANN_USERNAME and AUTOMANN_PASSWORD in .env file')
+
+    page = await client.get(LOGIN_PATH)
+    page.raise_for_status()
+    action, fields = login_form(page.text)
+    fields.update({'login[username]': username, 'login[password]': password})
+
+    response = await client.post(action or LOGIN_PATH, data=fields)
+    response.raise_for_status()
+    # A failed login lands back on the form
+    if 'login[username]' in response.text:
+        raise LoginError('Login failed: the login form was returned again')
+    print('Successfully logged in')
+
+
+def grid_record(row):
+    """Map one grid JSON row to the record shape scrape_products returns."""
+    new_product = {'vendor': 'Automann', 'sku': row.get('sku')}
+    for field in PINNED_FIELDS + CENTER_FIELDS:
+        value = row.get(field)
+        new_product[field] = None if value is None else str(value).strip()
+    return new_product
+
+
+async def fetch_tiles(client, category):
+    response = await client.get(TILES_PATH, params={'type1': category})
+    response.raise_for_status()
+    payload = response.json()
+    return payload['items'] if isinstance(payload, dict) else payload
+
+
+async def fetch_grid(client, tile_id, quarantine):
+    response = await client.get(GRID_PATH, params={'product': tile_id})
+    response.raise_for_status()
+    payload = response.json()
+    rows = payload['rows'] if isinstance(payload, dict) else payload
+
+    records = []
+    for row_index, row in enumerate(rows):
+        try:
+            record = grid_record(row)
+            if not record['sku']:
+                raise ValueError(f'Row {row_index} of product {tile_id} has no SKU')
+        except Exception as e:
+            print(f'Error processing row: {e}')
+            quarantine.append(quarantine_entry(e, row if isinstance(row, dict) else None, row_index))
+            continue
+        records.append(record)
+    return records
+
+
+async def scrape(categories, base_url=AUTOMANN_URL, concurrency=DEFAULT_CONCURRENCY, cookies=None):
+    """Fetch every grid of `categories`.
+
+    Returns (records in category and tile order, quarantined rows, failed
+    fetches). At most `concurrency` requests are in flight, all on one
+    pooled client, so none waits on the pool however many tiles are queued.
+    A tile listing or grid that can't be fetched is reported in failed as
+    (category, product id, or None for the listing) and the crawl goes on.
+    Without `cookies` the client logs in first.
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+    failed = []
+
+    async def fetch(category, tile_id, fetcher, *args):
+        async with slots:
+            try:
+                return await fetcher(client, *args)
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                print(f'{category} #{tile_id} failed: {e!r}')
+                failed.append((category, tile_id))
+                return []
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, cookies=cookies,
+        follow_redirects=True, timeout=REQUEST_TIMEOUT,
+    ) as client:
+        quarantined = []
+        if cookies is None:
+            await login(client)
+
+        tiles = await asyncio.gather(*(
+            fetch(category, None, fetch_tiles, category) for category in categories
+        ))
+        for category, products in zip(categories, tiles):
+            print(f'Found {len(products)} products for {category}')
+
+        grids = await asyncio.gather(*(
+            fetch(category, product['id'], fetch_grid, product['id'], quarantined)
+            for category, products in zip(categories, tiles) for product in products
+        ))
+    return [record for grid in grids for record in grid], quarantined, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scrape Automann torque rods over HTTP.')
+    parser.add_argument('--categories', default=','.join(CATEGORIES),
+                        help='comma-separated categories (default: all)')
+    parser.add_argument('--base-url', default=AUTOMANN_URL)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--selenium-login', action='store_true',
+                        help='log in with a headless browser and reuse its cookies')
+    parser.add_argument('--no-upload', action='store_true', help='scrape without loading the database')
+    args = parser.parse_args()
+
+    categories = [category.strip() for category in args.categories.split(',')]
+    cookies = None
+    if args.selenium_login:
+        from automann_scrape_ import get_driver, login as browser_login
+
+        driver = get_driver()
+        try:
+            driver.get(args.base_url)
+            if not browser_login(driver):
+                raise SystemExit('Browser login failed')
+            cookies = cookies_from_driver(driver)
+        finally:
+            driver.quit()
+
+    start = time.perf_counter()
+    records, quarantined, failed = asyncio.run(scrape(categories, args.base_url, args.concurrency, cookies))
+    print(f'Scraped {len(records)} rows in {time.perf_counter() - start:.2f}s')
+    if failed:
+        # A partial scrape would read as removed products; rerun instead
+        print(f'{len(failed)} fetches failed: {failed}; nothing applied')
+    elif not args.no_upload:
+        # Apply only what changed since the last run over the same categories
+        report = record_run(records, 'Automann', category_scope(categories), quarantined)
+        print(format_change_report(report))
@@ -0,0 +1,263 @@
+"""Scrape Automann torque rods with a pool of headless browsers.
+
+Each worker owns one Chrome, logs in once and takes work from a shared
+queue: one task per category to count its product tiles, then one task per
+tile. Finished work is appended to a JSON-lines checkpoint, so rerunning
+after a crash or failed products skips it and scrapes only what is left:
+
+    python automann_runner.py --workers 4 --checkpoint automann_run.jsonl
+
+Once a run has scraped every product (and applied it, unless --no-upload)
+its checkpoint is renamed to *.done.jsonl, so the next run starts afresh.
+
+To run against the local fixture site instead of automann.com:
+
+    python -m http.server 8765 -d fixtures/automann_site
+    AUTOMANN_URL=http://127.0.0.1:8765 AUTOMANN_USERNAME=demo AUTOMANN_PASSWORD=demo \\
+        python automann_runner.py --workers 2 --no-upload
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+from automann_scrape_ import (
+    AUTOMANN_URL, CATEGORIES, category_scope, get_driver, login, nav_to_products,
+    open_category, open_product, scrape_products,
+)
+from scrape_cdc import format_change_report, record_run
+
+DEFAULT_CHECKPOINT = 'automann_checkpoint.jsonl'
+
+
+class Checkpoint:
+    """Append-only JSON-lines log of finished work, replayed on resume.
+
+    Lines are either {"category", "tiles"} once a category's tiles are
+    counted, or {"category", "tile", "records", "quarantined"} once a tile
+    is scraped.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.tiles = {}
+        self.done = {}
+        self.quarantined = {}
+        if self.path.exists():
+            with self.path.open() as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash can leave the last line half written
+                        continue
+                    self._apply(entry)
+
+    def _apply(self, entry):
+        if 'tile' in entry:
+            key = (entry['category'], entry['tile'])
+            self.done[key] = entry['records']
+            self.quarantined[key] = entry.get('quarantined', [])
+        else:
+            self.tiles[entry['category']] = entry['tiles']
+
+    def _append(self, entry):
+        with self._lock:
+            with self.path.open('a') as f:
+                f.write(json.dumps(entry) + '\n')
+            self._apply(entry)
+
+    def record_tiles(self, category, count):
+        self._append({'category': category, 'tiles': count})
+
+    def record_tile(self, category, tile, records, quarantined=()):
+        self._append({
+            'category': category, 'tile': tile,
+            'records': records, 'quarantined': list(quarantined),
+        })
+
+    def is_done(self, category, tile):
+        return (category, tile) in self.done
+
+    def records(self, categories, quarantined=False):
+        """Scraped (or quarantined) rows of the given categories, in category and tile order."""
+        source = self.quarantined if quarantined else self.done
+        rows = []
+        for category in categories:
+            for tile in range(self.tiles.get(category, 0)):
+                rows.extend(source.get((category, tile), []))
+        return rows
+
+
+def retire_checkpoint(path):
+    """Rename a finished run's checkpoint aside; returns its new path, or None if there was none."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    done = path.with_name(f'{path.stem}.done{path.suffix}')
+    path.replace(done)
+    return done
+
+
+class BrowserWorker(threading.Thread):
+    """One logged-in browser working through (category, tile, attempt) tasks.
+
+    The browser is started and logged in on the first task, so idle workers
+    cost nothing. A task with tile None counts the category's tiles and queues one task per
+    tile not yet in the checkpoint. A failed task is retried up to `retries`
+    times on a fresh browser session.
+    """
+
+    def __init__(self, name, tasks, checkpoint, base_url=AUTOMANN_URL, retries=1):
+        super().__init__(name=name, daemon=True)
+        self.tasks = tasks
+        self.checkpoint = checkpoint
+        self.base_url = base_url
+        self.retries = retries
+        self.driver = None
+        self.category = None
+        self.products = []
+        self.failed = []
+
+    def session(self):
+        """The worker's browser, logged in and on the torque rods wizard."""
+        if self.driver is None:
+            driver = get_driver()
+            try:
+                driver.get(self.base_url)
+                if not login(driver):
+                    raise RuntimeError('login failed')
+                nav_to_products(driver)
+            except Exception:
+                driver.quit()
+                raise
+            self.driver = driver
+            self.category = None
+        return self.driver
+
+    def reset(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+        self.category = None
+
+    def open_category(self, category):
+        driver = self.session()
+        if self.category != category:
+            self.products = open_category(driver, category)
+            self.category = category
+        return self.products
+
+    def handle(self, category, tile):
+        products = self.open_category(category)
+        if tile is None:
+            self.checkpoint.record_tiles(category, len(products))
+            print(f'{self.name}: found {len(products)} products for {category}')
+            for index in range(len(products)):
+                if not self.checkpoint.is_done(category, index):
+                    self.tasks.put((category, index, 0))
+            return
+
+        open_product(self.driver, products[tile])
+        quarantined = []
+        records = scrape_products(self.driver, quarantine=quarantined)
+        if records is None:
+            raise RuntimeError('product grid could not be read')
+        self.checkpoint.record_tile(category, tile, records, quarantined)
+        print(f'{self.name}: scraped {len(records)} rows from {category} #{tile}')
+
+    def run(self):
+        try:
+            while True:
+                task = self.tasks.get()
+                try:
+                    if task is None:
+                        return
+                    category, tile, attempt = task
+                    try:
+                        self.handle(category, tile)
+                    except Exception as e:
+                        print(f'{self.name}: {category} #{tile} failed: {e}')
+                        self.reset()
+                        if attempt < self.retries:
+                            self.tasks.put((category, tile, attempt + 1))
+                        else:
+                            self.failed.append((category, tile))
+                finally:
+                    self.tasks.task_done()
+        finally:
+            self.reset()
+
+
+def run_scrape(categories, workers=4, checkpoint=DEFAULT_CHECKPOINT, base_url=AUTOMANN_URL, retries=1):
+    """Scrape `categories` with `workers` browsers.
+
+    Returns (records, quarantined rows, failed tasks).
+
+    Work already in the checkpoint is skipped, so a crashed run resumes
+    where it stopped.
+    """
+    checkpoint = Checkpoint(checkpoint)
+    tasks = queue.Queue()
+    for category in categories:
+        if category in checkpoint.tiles:
+            for tile in range(checkpoint.tiles[category]):
+                if not checkpoint.is_done(category, tile):
+                    tasks.put((category, tile, 0))
+        else:
+            tasks.put((category, None, 0))
+
+    pool = [
+        BrowserWorker(f'worker-{i}', tasks, checkpoint, base_url=base_url, retries=retries)
+        for i in range(workers)
+    ]
+    for worker in pool:
+        worker.start()
+    # Discovery tasks queue their tiles before finishing, so this waits for those too
+    tasks.join()
+    for worker in pool:
+        tasks.put(None)
+    for worker in pool:
+        worker.join()
+
+    failed = [task for worker in pool for task in worker.failed]
+    return checkpoint.records(categories), checkpoint.records(categories, quarantined=True), failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scrape Automann torque rods in parallel.')
+    parser.add_argument('--categories', default=','.join(CATEGORIES),
+                        help='comma-separated categories (default: all)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--base-url', default=AUTOMANN_URL)
+    parser.add_argument('--retries', type=int, default=1)
+    parser.add_argument('--no-upload', action='store_true', help='scrape without loading the database')
+    args = parser.parse_args()
+
+    categories = [category.strip() for category in args.categories.split(',')]
+    unknown = [category for category in categories if category not in CATEGORIES]
+    if unknown:
+        parser.error(f'unknown categories: {", ".join(unknown)}')
+
+    start = time.perf_counter()
+    records, quarantined, failed = run_scrape(
+        categories, workers=args.workers, checkpoint=args.checkpoint,
+        base_url=args.base_url, retries=args.retries,
+    )
+    print(f'Scraped {len(records)} rows in {time.perf_counter() - start:.1f}s')
+    if failed:
+        # Left out of the checkpoint, so the next run picks them up
+        print(f'{len(failed)} products failed: {failed}; rerun to resume')
+    elif not args.no_upload:
+        # Apply only what changed since the last run over the same categories
+        report = record_run(records, 'Automann', category_scope(categories), quarantined)
+        print(format_change_report(report))
+    if not failed:
+        print(f'Checkpoint kept as {retire_checkpoint(args.checkpoint)}')
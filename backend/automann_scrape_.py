@@ -1,20 +1,24 @@
 import os
 import platform
-import time
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import TimeoutException
 from dotenv import load_dotenv
-from database import Product, get_db
+import lxml.html
+from scrape_cdc import format_change_report, quarantine_entry, record_run
 
 
 # Load environment variables
 load_dotenv()
 
+AUTOMANN_URL = os.getenv('AUTOMANN_URL', 'https://www.automann.com')
+# Upper bound for every explicit wait; they return as soon as the condition holds
+WAIT_SECONDS = float(os.getenv('AUTOMANN_WAIT_SECONDS', '10'))
+
 with_bushing_xpath = '//*[@id="type-container"]/div/div[1]/div[1]/div[2]/div/div/div/div/a[1]'
 full_ball_xpath = '//*[@id="type-container"]/div/div[1]/div[1]/div[2]/div/div/div/div/a[2]'
 cabin_xpath = '//*[@id="type-container"]/div/div[1]/div[1]/div[2]/div/div/div/div/a[3]'
@@ -23,9 +27,52 @@ with_bushing = "With Bushing"
 full_ball = "Full Ball"
 cabin = "Cabin"
 
-TORQUE_ROD_CATEGORY_XPATH = cabin_xpath
+# Category name -> its link on the torque rods wizard
+CATEGORIES = {
+    with_bushing: with_bushing_xpath,
+    full_ball: full_ball_xpath,
+    cabin: cabin_xpath,
+}
+
 TORQUE_ROD_CATEGORY = cabin
 
+# The product grid's pinned (sku, type1, type2) and scrolling containers
+PINNED_GRID_XPATH = '//*[@id="wizard-wrap"]/div[2]/div[2]/div[2]/div[3]/div[1]/div/div[1]'
+CENTER_GRID_XPATH = '//*[@id="wizard-wrap"]/div[2]/div[2]/div[2]/div[3]/div[1]/div/div[2]'
+
+# Grid fields read from each container; sku is the pinned row's link text
+PINNED_FIELDS = ['type1', 'type2']
+CENTER_FIELDS = [
+    'c_to_c', 'side_a', 'side_b', 'side_a_bushing', 'side_b_bushing',
+    'side_a_angle', 'side_b_angle', 'shaft_dia',
+]
+
+# How scrape_products reads the grid: "script" (one execute_script call),
+# "lxml" (one page_source parse) or "cells" (a WebDriver call per cell)
+EXTRACTION = os.getenv('AUTOMANN_EXTRACTION', 'script')
+
+# Returns [pinned, center], each {row-index: {col-id: text, sku: link text}}
+READ_GRID_SCRIPT = """
+const container = (xpath) => document.evaluate(
+    xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+const read = (node) => {
+    const rows = {};
+    if (!node) return rows;
+    for (const row of node.querySelectorAll('[row-index]')) {
+        const cells = {};
+        const link = row.querySelector('a');
+        if (link) cells.sku = link.innerText.trim();
+        for (const cell of row.querySelectorAll('[col-id]')) {
+            cells[cell.getAttribute('col-id')] = cell.innerText.trim();
+        }
+        rows[row.getAttribute('row-index')] = cells;
+    }
+    return rows;
+};
+return [read(container(arguments[0])), read(container(arguments[1]))];
+"""
+
 
 UPLOAD_TO_DB = True
 
@@ -68,14 +115,12 @@ def login(driver):
        login_button = wait.until(
            EC.element_to_be_clickable((By.XPATH, '//*[@id="navigation"]/div/a[2]'))
        )
-       time.sleep(1)  # Small delay before clicking
        login_button.click()
       
        # Wait for and fill username field
        username_field = wait.until(
            EC.element_to_be_clickable((By.NAME, 'login[username]'))
        )
-       time.sleep(1)  # Small delay before typing
        username_field.clear()  # Clear any existing text
        username_field.send_keys(username)
       
@@ -83,7 +128,6 @@ def login(driver):
        password_field = wait.until(
            EC.element_to_be_clickable((By.NAME, 'login[password]'))
        )
-       time.sleep(1)  # Small delay before typing
        password_field.clear()  # Clear any existing text
        password_field.send_keys(password)
       
@@ -91,7 +135,6 @@ def login(driver):
        login_submit_button = wait.until(
            EC.element_to_be_clickable((By.CSS_SELECTOR, '.btn.btn-primary.btn-lg.w-full.mb-2.lg\:mb-0.lg\:w-fit'))
        )
-       time.sleep(1)  # Small delay before clicking
        login_submit_button.click()
       
        # Wait for login to complete by checking for user's name in h3 tag
@@ -114,20 +157,18 @@ def login(driver):
 
 
 def nav_to_products(driver):
-   wait = WebDriverWait(driver, 3)
+   wait = WebDriverWait(driver, WAIT_SECONDS)
 
 
    wizard = wait.until(
        EC.element_to_be_clickable((By.XPATH, '//*[@id="navigation"]/ul[2]/li[5]'))
    )
-   time.sleep(1)
    wizard.click()
 
 
    torque_rods = wait.until(
        EC.element_to_be_clickable((By.XPATH, '//a[contains(text(), "Truck Torque Rods")]'))
    )
-   time.sleep(1)
    torque_rods.click()
 
 
@@ -138,116 +179,231 @@ def nav_to_products(driver):
    return
 
 
-def iterate_products(driver):
-   wait = WebDriverWait(driver, 3)
+def open_category(driver, category):
+   """Open a category on the torque rods wizard and return its product tiles."""
+   wait = WebDriverWait(driver, WAIT_SECONDS)
 
-   print('Navigating to category')
-   with_bushing = wait.until(
-       EC.element_to_be_clickable((By.XPATH, TORQUE_ROD_CATEGORY_XPATH))
+   link = wait.until(
+       EC.element_to_be_clickable((By.XPATH, CATEGORIES[category]))
    )
-   time.sleep(1)
-   with_bushing.click()
+   link.click()
+
+   # Wait for the category's tiles instead of sleeping through the load
+   try:
+       return wait.until(
+           EC.presence_of_all_elements_located((By.CSS_SELECTOR, f'[data-type1="{category}"]'))
+       )
+   except TimeoutException:
+       return []
+
+
+def open_product(driver, product):
+   """Click a product tile and wait for its grid to replace the previous one."""
+   wait = WebDriverWait(driver, WAIT_SECONDS)
+   previous = driver.find_elements(By.XPATH, f'{PINNED_GRID_XPATH}//*[@row-index]')
+
+   product.click()
+
+   if previous:
+       try:
+           wait.until(EC.staleness_of(previous[0]))
+       except TimeoutException:
+           print('Grid rows were not replaced; the grid may have reused them')
+   try:
+       wait.until(
+           EC.presence_of_element_located((By.XPATH, f'{PINNED_GRID_XPATH}//*[@row-index]'))
+       )
+   except TimeoutException:
+       print('Product grid has no rows')
+
+
+def category_scope(categories):
+   """Snapshot scope of a run over `categories`; see scrape_cdc.record_run."""
+   return ','.join(sorted(categories))
+
+
+def iterate_products(driver, category=TORQUE_ROD_CATEGORY):
+   print('Navigating to category')
+   products = open_category(driver, category)
    print('Successfully navigated to category')
+   print(f'Found {len(products)} products for {category}')
 
-   # Wait for products to load
-   time.sleep(2)
-  
-   # Find all product containers
-   products = driver.find_elements(By.CSS_SELECTOR, f'[data-type1="{TORQUE_ROD_CATEGORY}"]')
-   print(f'Found {len(products)} products for {TORQUE_ROD_CATEGORY}')
-  
    # Loop through each product
+   new_products = []
+   quarantined = []
    for product in products:
-       product.click()
-       time.sleep(1)
+       open_product(driver, product)
        print('Scraping new product')
-       scrape_products(driver)
+       records = scrape_products(driver, quarantine=quarantined)
+       if records is None:
+           raise RuntimeError('Product grid could not be read; not applying a partial run')
+       new_products.extend(records)
 
-   print('Finished scraping products')
-   return
+   if UPLOAD_TO_DB:
+       # Apply only what changed since the last run of this category
+       report = record_run(new_products, 'Automann', category_scope([category]), quarantined)
+       print(format_change_report(report))
 
-
-
-def scrape_products(driver):
+   print('Finished scraping products')
+   return new_products
+
+
+
+def extract_grid_cells(container1, container2, quarantine=None):
+    """Read the grid one WebDriver call per cell (about 12 round trips a row)."""
+    # Find all rows with row-index attribute
+    rows1 = container1.find_elements(By.CSS_SELECTOR, '[row-index]')
+    rows2 = container2.find_elements(By.CSS_SELECTOR, '[row-index]')
+
+
+    rows = zip(rows1, rows2)
+    new_products = []
+    
+    for row_index, (row1, row2) in enumerate(rows):
+        new_product = {'vendor': 'Automann'}
+        try:     
+            # ROW 1 SCRAPE    
+            sku = row1.find_element(By.TAG_NAME, 'a')
+            new_product['sku'] = sku.text
+            
+            type1_container = row1.find_element(By.CSS_SELECTOR, '[col-id="type1"]')
+            # type1 = type1_container.find_element(By.CLASS_NAME, 'w-fit')
+            new_product['type1'] = type1_container.text
+
+
+            type2_container = row1.find_element(By.CSS_SELECTOR, '[col-id="type2"]')
+            # type2 = type2_container.find_element(By.CLASS_NAME, 'w-fit')
+            new_product['type2'] = type2_container.text
+            
+            # ROW 2 SCRAPE
+            c_to_c_container = row2.find_element(By.CSS_SELECTOR, '[col-id="c_to_c"]')
+            new_product['c_to_c'] = c_to_c_container.text
+            
+            side_a_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_a"]')
+            new_product['side_a'] = side_a_container.text
+            
+            side_b_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_b"]')
+            new_product['side_b'] = side_b_container.text
+
+
+            side_a_bushing_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_a_bushing"]')
+            new_product['side_a_bushing'] = side_a_bushing_container.text
+            
+            side_b_bushing_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_b_bushing"]')
+            new_product['side_b_bushing'] = side_b_bushing_container.text
+
+
+            side_a_angle_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_a_angle"]')
+            new_product['side_a_angle'] = side_a_angle_container.text
+            
+            side_b_angle_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_b_angle"]')
+            new_product['side_b_angle'] = side_b_angle_container.text
+            
+            shaft_dia_container = row2.find_element(By.CSS_SELECTOR, '[col-id="shaft_dia"]')
+            new_product['shaft_dia'] = shaft_dia_container.text
+
+
+            new_products.append(new_product)
+                
+        except Exception as e:
+            # Quarantine the row and keep going; one bad row must not drop the grid
+            print(f'Error processing row: {e}')
+            if quarantine is not None:
+                quarantine.append(quarantine_entry(e, new_product, row_index))
+
+    return new_products
+
+
+def join_grid_rows(pinned_rows, center_rows, quarantine=None):
+    """Join the two containers' {row-index: cells} on row-index into product records.
+
+    Rows missing from either container or without a SKU are quarantined.
+    """
+    new_products = []
+    for index in sorted(set(pinned_rows) | set(center_rows), key=int):
+        pinned, center = pinned_rows.get(index), center_rows.get(index)
+        new_product = {'vendor': 'Automann', 'sku': (pinned or {}).get('sku')}
+        for field in PINNED_FIELDS:
+            new_product[field] = (pinned or {}).get(field)
+        for field in CENTER_FIELDS:
+            new_product[field] = (center or {}).get(field)
+
+        error = None
+        if pinned is None or center is None:
+            error = f'Row {index} is missing from the {"pinned" if pinned is None else "center"} grid'
+        elif not new_product['sku']:
+            error = f'Row {index} has no SKU'
+        if error:
+            print(f'Error processing row: {error}')
+            if quarantine is not None:
+                quarantine.append(quarantine_entry(error, new_product, int(index)))
+            continue
+        new_products.append(new_product)
+    return new_products
+
+
+def extract_grid_script(driver, quarantine=None):
+    """Read both grid containers with a single execute_script round trip."""
+    pinned_rows, center_rows = driver.execute_script(
+        READ_GRID_SCRIPT, PINNED_GRID_XPATH, CENTER_GRID_XPATH
+    )
+    return join_grid_rows(pinned_rows, center_rows, quarantine)
+
+
+def _read_container(container):
+    rows = {}
+    for row in container.xpath('.//*[@row-index]'):
+        cells = {}
+        link = row.find('.//a')
+        if link is not None:
+            cells['sku'] = link.text_content().strip()
+        for cell in row.xpath('.//*[@col-id]'):
+            cells[cell.get('col-id')] = cell.text_content().strip()
+        rows[row.get('row-index')] = cells
+    return rows
+
+
+def parse_grid(page_source, quarantine=None):
+    """Parse both grid containers out of one page_source snapshot with lxml."""
+    tree = lxml.html.fromstring(page_source)
+    pinned, center = tree.xpath(PINNED_GRID_XPATH), tree.xpath(CENTER_GRID_XPATH)
+    if not pinned or not center:
+        return []
+    return join_grid_rows(_read_container(pinned[0]), _read_container(center[0]), quarantine)
+
+
+def scrape_products(driver, extraction=None, quarantine=None):
+    """Read the open product grid into records.
+
+    Unreadable rows are appended to `quarantine` (see scrape_cdc) and
+    skipped; None is returned only when the grid itself can't be read.
+    """
     try:
-
-        db = next(get_db())
-
-        wait = WebDriverWait(driver, 3)
+        wait = WebDriverWait(driver, WAIT_SECONDS)
         
         # Wait for the container element
         container1 = wait.until(
-            EC.presence_of_element_located((By.XPATH, '//*[@id="wizard-wrap"]/div[2]/div[2]/div[2]/div[3]/div[1]/div/div[1]'))
+            EC.presence_of_element_located((By.XPATH, PINNED_GRID_XPATH))
         )
 
 
         container2 = wait.until(
-            EC.presence_of_element_located((By.XPATH, '//*[@id="wizard-wrap"]/div[2]/div[2]/div[2]/div[3]/div[1]/div/div[2]'))
+            EC.presence_of_element_located((By.XPATH, CENTER_GRID_XPATH))
         )
-        # Find all rows with row-index attribute
-        rows1 = container1.find_elements(By.CSS_SELECTOR, '[row-index]')
-        rows2 = container2.find_elements(By.CSS_SELECTOR, '[row-index]')
-
-
-        rows = zip(rows1, rows2)
-        
-        for row1, row2 in rows:
-            new_product = Product()
-            try:     
-                # ROW 1 SCRAPE    
-                sku = row1.find_element(By.TAG_NAME, 'a')
-                new_product.sku = sku.text
-                
-                type1_container = row1.find_element(By.CSS_SELECTOR, '[col-id="type1"]')
-                # type1 = type1_container.find_element(By.CLASS_NAME, 'w-fit')
-                new_product.type1 = type1_container.text
-
-
-                type2_container = row1.find_element(By.CSS_SELECTOR, '[col-id="type2"]')
-                # type2 = type2_container.find_element(By.CLASS_NAME, 'w-fit')
-                new_product.type2 = type2_container.text
-                
-                # ROW 2 SCRAPE
-                c_to_c_container = row2.find_element(By.CSS_SELECTOR, '[col-id="c_to_c"]')
-                new_product.c_to_c = c_to_c_container.text
-                
-                side_a_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_a"]')
-                new_product.side_a = side_a_container.text
-                
-                side_b_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_b"]')
-                new_product.side_b = side_b_container.text
-
-
-                side_a_bushing_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_a_bushing"]')
-                new_product.side_a_bushing = side_a_bushing_container.text
-                
-                side_b_bushing_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_b_bushing"]')
-                new_product.side_b_bushing = side_b_bushing_container.text
-
-
-                side_a_angle_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_a_angle"]')
-                new_product.side_a_angle = side_a_angle_container.text
-                
-                side_b_angle_container = row2.find_element(By.CSS_SELECTOR, '[col-id="side_b_angle"]')
-                new_product.side_b_angle = side_b_angle_container.text
-                
-                shaft_dia_container = row2.find_element(By.CSS_SELECTOR, '[col-id="shaft_dia"]')
-                new_product.shaft_dia = shaft_dia_container.text
-
 
-                print(f'New product: {new_product.sku} - {new_product.type2} - {new_product.side_b_bushing}')
-                if UPLOAD_TO_DB:
-                    db.add(new_product)
-                    
-            except Exception as e:
-                print(f'Error processing row: {e}')
-                return
+        extraction = extraction or EXTRACTION
+        if extraction == 'script':
+            new_products = extract_grid_script(driver, quarantine)
+        elif extraction == 'lxml':
+            new_products = parse_grid(driver.page_source, quarantine)
+        else:
+            new_products = extract_grid_cells(container1, container2, quarantine)
 
-        if UPLOAD_TO_DB:
-            db.commit()  # Commit the transaction
+        for new_product in new_products:
+            print(f"New product: {new_product['sku']} - {new_product['type2']} - {new_product['side_b_bushing']}")
+        return new_products
 
     except Exception as e:
-        db.rollback()  # Rollback on error
         print(f'Error processing products: {e}')
 
 
@@ -255,13 +411,11 @@ if __name__ == '__main__':
    driver = get_driver()
    try:
        # Navigate to login page
-       driver.get('https://www.automann.com')
+       driver.get(AUTOMANN_URL)
        print('Successfully connected to Automann')
       
        # Attempt login
        if login(driver):
-           # Wait a bit to see the dashboard (since we're not in headless mode)
-           time.sleep(5)
            nav_to_products(driver)
            iterate_products(driver)
 
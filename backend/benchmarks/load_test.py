@@ -0,0 +1,128 @@
+"""Load test /api/products/search in the sync and async DB modes.
+
+Starts the API once per mode with uvicorn (API_DB_MODE=sync|async), forcing
+every search through Postgres (SEARCH_BACKEND=postgres, cache disabled), and
+drives it with concurrent clients for a fixed duration:
+
+    python -m benchmarks.load_test --concurrency 64 --duration 20
+
+Pass --url to load an already running server instead.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.search_index_bench import query_mix
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def drive(url, concurrency, duration, seed=0):
+    """Run `concurrency` clients in a closed loop for `duration` seconds."""
+    rng = random.Random(seed)
+    payloads = [
+        search.model_dump(exclude_none=True)
+        for _ in range(50)
+        for search in query_mix(rng)
+    ]
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                payload = payloads[i % len(payloads)]
+                i += concurrency
+                start = time.perf_counter()
+                try:
+                    response = await client.post('/api/products/search', json=payload)
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+    }
+
+
+def start_server(mode, port, env=None):
+    """Start the API in `mode` on `port`; `env` overrides the Postgres-only defaults."""
+    env = {
+        **os.environ,
+        'API_DB_MODE': mode,
+        'SEARCH_BACKEND': 'postgres',
+        'SEARCH_CACHE_SIZE': '0',
+        **(env or {}),
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            httpx.get(url + '/', timeout=1).raise_for_status()
+            return server, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'API in {mode} mode did not become healthy')
+
+
+def report(mode, result):
+    print(
+        f"{mode:>6} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+        f"{result['p50']:>9.2f} {result['p95']:>9.2f} {result['p99']:>9.2f}"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='sync,async')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--url', help='load this running server instead of starting one per mode')
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    if args.url:
+        report('-', asyncio.run(drive(args.url, args.concurrency, args.duration)))
+    else:
+        for mode in args.modes.split(','):
+            server, url = start_server(mode, args.port)
+            try:
+                report(mode, asyncio.run(drive(url, args.concurrency, args.duration)))
+            finally:
+                server.terminate()
+                server.wait()
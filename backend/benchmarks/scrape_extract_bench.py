@@ -0,0 +1,78 @@
+"""Grid extraction throughput: per-cell WebDriver calls versus bulk reads.
+
+Opens the recorded 200-row grid page (fixtures/automann_grid.html) in
+headless Chrome and reads it with every scrape_products extraction mode,
+checking they return the same records:
+
+    python -m benchmarks.scrape_extract_bench --rounds 5
+
+--no-browser times only the lxml parse of the saved file.
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from selenium.webdriver.common.by import By
+
+from automann_scrape_ import (
+    CENTER_GRID_XPATH, PINNED_GRID_XPATH, extract_grid_cells, extract_grid_script,
+    get_driver, parse_grid,
+)
+
+FIXTURE_PAGE = Path(__file__).resolve().parent.parent / 'fixtures' / 'automann_grid.html'
+
+
+def measure(extract, rounds):
+    """Median seconds per call of `extract` and the records of its last call."""
+    timings = []
+    records = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        records = extract()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), records
+
+
+def report(mode, seconds, records):
+    print(f"{mode:>14} {len(records):>6} {seconds * 1000:>10.1f} {len(records) / seconds:>10.0f}")
+
+
+def run(rounds, browser=True):
+    source = FIXTURE_PAGE.read_text()
+    print(f"{'mode':>14} {'rows':>6} {'ms':>10} {'rows/sec':>10}")
+
+    seconds, expected = measure(lambda: parse_grid(source), rounds)
+    report('lxml (file)', seconds, expected)
+    if not browser:
+        return
+
+    driver = get_driver()
+    try:
+        driver.get(FIXTURE_PAGE.as_uri())
+
+        def cells():
+            container1 = driver.find_element(By.XPATH, PINNED_GRID_XPATH)
+            container2 = driver.find_element(By.XPATH, CENTER_GRID_XPATH)
+            return extract_grid_cells(container1, container2)
+
+        modes = [
+            ('cells', cells),
+            ('script', lambda: extract_grid_script(driver)),
+            ('lxml', lambda: parse_grid(driver.page_source)),
+        ]
+        for mode, extract in modes:
+            seconds, records = measure(extract, rounds)
+            report(mode, seconds, records)
+            if records != expected:
+                print(f"{mode:>14} returned different records than the lxml parse")
+    finally:
+        driver.quit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--no-browser', action='store_true', help='time the lxml parse only')
+    args = parser.parse_args()
+    run(args.rounds, browser=not args.no_browser)
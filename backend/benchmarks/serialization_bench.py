@@ -0,0 +1,100 @@
+"""Search response serialization: bytes/sec and CPU per request, old paths versus orjson.
+
+Encodes search pages built from synthetic result rows (SQLAlchemy Row
+objects, as the DB path receives them) at several page sizes:
+
+- jsonable_encoder: returning the response dict and letting FastAPI encode it
+- json_response: dict(row._mapping) per row into a stdlib JSONResponse
+- orjson: page_response over the rows, encoded with orjson
+- orjson+gzip / orjson+br: the same, compressed as negotiated
+
+    python -m benchmarks.serialization_bench --sizes 10,100,1000
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.engine.result import result_tuple
+
+from benchmarks.synthetic_catalog import generate_rows
+from response_encoding import encode_page, page_http_response
+from search_filters import RESULT_COLUMNS, ProductSearch, page_response
+
+
+def result_rows(count):
+    make_row = result_tuple(RESULT_COLUMNS)
+    return [
+        make_row([position + 1] + [row.get(name) for name in RESULT_COLUMNS[1:]])
+        for position, row in enumerate(generate_rows(count))
+    ]
+
+
+def dict_response(search_query, rows):
+    """The response dict as the DB path built it before orjson."""
+    products = [dict(row._mapping) for row in rows]
+    has_more = len(products) > search_query.limit
+    products = products[:search_query.limit]
+    return {"products": products, "next_cursor": products[-1]['id'] if has_more else None}
+
+
+def encode_jsonable(search_query, rows):
+    return json.dumps(jsonable_encoder(dict_response(search_query, rows))).encode('utf-8')
+
+
+def encode_json_response(search_query, rows):
+    return JSONResponse(content=dict_response(search_query, rows)).body
+
+
+def encoder_orjson(accept_encoding=None):
+    def encode(search_query, rows):
+        page = encode_page(page_response(search_query, rows))
+        # A fresh page per request, so compression is not served from the page's variants
+        return page_http_response(page, accept_encoding).body
+    return encode
+
+
+PATHS = {
+    'jsonable_encoder': encode_jsonable,
+    'json_response': encode_json_response,
+    'orjson': encoder_orjson(),
+    'orjson+gzip': encoder_orjson('gzip'),
+    'orjson+br': encoder_orjson('br'),
+}
+
+
+def measure(encode, search_query, rows, seconds):
+    """Requests encoded, CPU seconds per request and output bytes per request over `seconds`."""
+    requests = 0
+    size = 0
+    cpu_start = time.process_time()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        size = len(encode(search_query, rows))
+        requests += 1
+    return requests, (time.process_time() - cpu_start) / requests, size
+
+
+def run(sizes, seconds):
+    print(f"{'rows':>6} {'path':>17} {'req/cpu-s':>9} {'cpu ms/req':>11} {'body bytes':>11} {'JSON MB/s':>10}")
+    for size in sizes:
+        search_query = ProductSearch(sku='TR', limit=size)
+        # One lookahead row, as build_search_query fetches
+        rows = result_rows(size + 1)
+        json_bytes = len(encode_json_response(search_query, rows))
+        for name, encode in PATHS.items():
+            requests, cpu, body = measure(encode, search_query, rows, seconds)
+            print(
+                f"{size:>6} {name:>17} {1 / cpu:>9.0f} {cpu * 1000:>11.3f} "
+                f"{body:>11} {json_bytes / cpu / 1e6:>10.1f}"
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000')
+    parser.add_argument('--seconds', type=float, default=2, help='time spent on each path and size')
+    args = parser.parse_args()
+
+    run([int(size) for size in args.sizes.split(',')], args.seconds)
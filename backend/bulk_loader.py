@@ -0,0 +1,207 @@
+import time
+
+from sqlalchemy import column, insert, table, text
+
+from database import bump_catalog_version, engine as default_engine
+from interchange import refresh_interchange
+from product_fields import CONTENT_FIELDS, MEASUREMENT_FIELDS, fill_derived
+
+# Every torque_rods column an ingestion path can write
+LOAD_COLUMNS = CONTENT_FIELDS + list(MEASUREMENT_FIELDS.values()) + ['content_hash', 'fit_key']
+# Columns an upsert may rewrite; the (vendor, sku) key stays put
+UPDATE_COLUMNS = [name for name in LOAD_COLUMNS if name not in ('vendor', 'sku')]
+
+STAGE_TABLE = 'torque_rods_stage'
+# Rows per INSERT when COPY isn't available
+INSERT_BATCH_SIZE = 1000
+
+
+def prepare_row(row):
+    """Return a copy of `row` with every load column set and derived columns filled.
+
+    A blank vendor is stored as NULL, so it shares one (vendor, sku) key with
+    rows that have none.
+    """
+    prepared = {name: row.get(name) for name in LOAD_COLUMNS}
+    if isinstance(prepared['vendor'], str):
+        prepared['vendor'] = prepared['vendor'].strip() or None
+    return fill_derived(prepared)
+
+
+def frame_rows(frame):
+    """Yield the rows of a pandas DataFrame as dicts, with missing values as None."""
+    names = list(frame.columns)
+    values = frame.astype(object).where(frame.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        yield dict(zip(names, row))
+
+
+def csv_value(value):
+    """Render one value for COPY ... (FORMAT csv): NULL is unquoted empty, strings are quoted."""
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class CsvRowStream:
+    """Read-only file object rendering rows as CSV on demand for COPY FROM STDIN."""
+
+    def __init__(self, rows, columns=LOAD_COLUMNS):
+        self._rows = iter(rows)
+        self._columns = columns
+        self._pending = ''
+        self.count = 0
+
+    def read(self, size=-1):
+        lines = []
+        length = len(self._pending)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = ','.join(csv_value(row[name]) for name in self._columns) + '\n'
+            lines.append(line)
+            length += len(line)
+            self.count += 1
+        self._pending += ''.join(lines)
+
+        if size < 0:
+            chunk, self._pending = self._pending, ''
+        else:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+def _stage_with_copy(conn, rows):
+    stream = CsvRowStream(rows)
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {STAGE_TABLE} ({', '.join(LOAD_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            stream,
+        )
+    finally:
+        cursor.close()
+    return stream.count
+
+
+def _stage_with_inserts(conn, rows):
+    stage = table(STAGE_TABLE, *(column(name) for name in LOAD_COLUMNS))
+    staged = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            conn.execute(insert(stage).values(batch))
+            staged += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(stage).values(batch))
+        staged += len(batch)
+    return staged
+
+
+def _supports_copy(conn):
+    return conn.dialect.driver == 'psycopg2'
+
+
+def bulk_load(rows, engine=default_engine, delete=(), refresh=True):
+    """Upsert product rows into torque_rods in a single transaction.
+
+    `rows` is any iterable of dicts keyed by torque_rods column names, or a
+    pandas DataFrame with those columns; it is streamed into a temporary
+    staging table with COPY (or batched INSERTs on drivers without COPY) and
+    merged with one INSERT ... ON CONFLICT (vendor, sku) DO UPDATE, where a
+    NULL vendor or SKU matches NULL (the constraint is NULLS NOT DISTINCT). Existing
+    rows are only rewritten when their content hash changed, only the
+    interchange groups those rows join or leave are recomputed, and the
+    catalog version is only bumped when something changed. `delete` lists
+    (vendor, sku) keys to remove in the same transaction. With
+    refresh=False the interchange groups and catalog version are left alone,
+    for callers loading batches concurrently that refresh both once at the end.
+
+    Returns a report with staged, inserted, updated, unchanged and deleted
+    counts and rows/sec; unchanged counts distinct (vendor, sku) keys, so a
+    row staged twice in one load is counted once.
+    """
+    start = time.perf_counter()
+    if hasattr(rows, 'itertuples'):
+        rows = frame_rows(rows)
+    prepared = (prepare_row(row) for row in rows)
+    columns = ', '.join(LOAD_COLUMNS)
+    assignments = ', '.join(f"{name} = EXCLUDED.{name}" for name in UPDATE_COLUMNS)
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TEMP TABLE {STAGE_TABLE} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM torque_rods WITH NO DATA"
+        ))
+        # Load order, so the last copy of a duplicated (vendor, sku) wins
+        conn.execute(text(f"ALTER TABLE {STAGE_TABLE} ADD COLUMN stage_seq bigserial"))
+        if _supports_copy(conn):
+            staged = _stage_with_copy(conn, prepared)
+        else:
+            staged = _stage_with_inserts(conn, prepared)
+
+        # Groups the changed rows are leaving, read before the merge rewrites them
+        fit_keys = set(conn.execute(text(f"""
+            SELECT DISTINCT t.fit_key FROM torque_rods t
+            JOIN {STAGE_TABLE} s ON s.vendor IS NOT DISTINCT FROM t.vendor AND s.sku IS NOT DISTINCT FROM t.sku
+            WHERE t.content_hash IS DISTINCT FROM s.content_hash
+        """)).scalars())
+
+        # keys counts distinct staged (vendor, sku) pairs, so in-load duplicates aren't unchanged rows
+        inserted, merged, merged_keys, keys = conn.execute(text(f"""
+            WITH merged AS (
+                INSERT INTO torque_rods ({columns})
+                SELECT DISTINCT ON (vendor, sku) {columns} FROM {STAGE_TABLE}
+                ORDER BY vendor, sku, stage_seq DESC
+                ON CONFLICT (vendor, sku) DO UPDATE SET {assignments}
+                WHERE torque_rods.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                RETURNING (xmax = 0) AS inserted, fit_key
+            )
+            SELECT count(*) FILTER (WHERE inserted), count(*), array_agg(DISTINCT fit_key),
+                   (SELECT count(*) FROM (SELECT DISTINCT vendor, sku FROM {STAGE_TABLE}) staged_keys)
+            FROM merged
+        """)).one()
+        updated = merged - inserted
+        fit_keys.update(merged_keys or [])
+
+        deleted = 0
+        if delete:
+            vendors, skus = zip(*delete)
+            deleted_keys = conn.execute(text("""
+                DELETE FROM torque_rods t
+                USING unnest(CAST(:vendors AS text[]), CAST(:skus AS text[])) AS d(vendor, sku)
+                WHERE t.vendor IS NOT DISTINCT FROM d.vendor AND t.sku IS NOT DISTINCT FROM d.sku
+                RETURNING t.fit_key
+            """), {'vendors': list(vendors), 'skus': list(skus)}).scalars().all()
+            deleted = len(deleted_keys)
+            fit_keys.update(deleted_keys)
+
+        if refresh and (merged or deleted):
+            # Only the groups rows joined or left are recomputed
+            refresh_interchange(conn, fit_keys)
+            bump_catalog_version(conn)
+
+    seconds = time.perf_counter() - start
+    return {
+        'staged': staged,
+        'inserted': inserted,
+        'updated': updated,
+        'unchanged': keys - merged,
+        'deleted': deleted,
+        'seconds': seconds,
+        'rows_per_sec': staged / seconds if seconds else 0.0,
+    }
+
+
+def format_report(report):
+    return (
+        f"Staged {report['staged']} rows: {report['inserted']} inserted, "
+        f"{report['updated']} updated, {report['unchanged']} unchanged, "
+        f"{report.get('deleted', 0)} deleted "
+        f"in {report['seconds']:.2f}s ({report['rows_per_sec']:.0f} rows/sec)"
+    )
@@ -0,0 +1,477 @@
+import logging
+import math
+import os
+import select
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import combinations
+
+import numpy as np
+from scipy.spatial import cKDTree
+from sqlalchemy import text
+
+from database import CATALOG_CHANNEL, Product, get_catalog_version
+from facets import FACET_FIELDS, facets_response
+from nearest import NEAREST_WEIGHTS, nearest_response, orientations
+from product_fields import MEASUREMENT_FIELDS
+from search_filters import FIELD_MATCHES, RESULT_COLUMNS, page_response, search_predicates
+
+logger = logging.getLogger(__name__)
+
+# Low-cardinality fields are interned into integer codes
+CATEGORICAL_FIELDS = ['type1', 'side_a', 'side_b', 'vendor']
+COLUMNS = [column.name for column in Product.__table__.columns]
+NGRAM = 3
+
+CATALOG_REFRESH_SECONDS = float(os.getenv('CATALOG_REFRESH_SECONDS', '300'))
+
+# Neighbours fetched per requested result before filters are applied; grown
+# by the same factor while filtered-out rows leave fewer than k, until it
+# would pass the number of rows the filters allow, which are then ranked directly
+NEAREST_OVERFETCH = 4
+# Every set of measured columns a closest-fit target can have, one KD-tree each
+NEAREST_COLUMN_SETS = [
+    columns
+    for size in range(1, len(NEAREST_WEIGHTS) + 1)
+    for columns in combinations(sorted(NEAREST_WEIGHTS), size)
+]
+
+
+def ngrams(value):
+    return {value[i:i + NGRAM] for i in range(len(value) - NGRAM + 1)}
+
+
+def bitmap(positions, size):
+    """An int with bit p set for every position p."""
+    bits = bytearray((size + 7) // 8)
+    for p in positions:
+        bits[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(bits, 'little')
+
+
+# int.bit_count arrived in Python 3.10
+popcount = getattr(int, 'bit_count', None) or (lambda value: bin(value).count('1'))
+
+
+class CatalogSnapshot:
+    """Immutable, array-backed copy of torque_rods.
+
+    Rows are addressed by their position, which follows id order. Categorical
+    fields keep one code per row plus a posting list per code; every other
+    search field keeps a lowercase string array plus n-gram posting lists.
+    Numeric shadow columns keep a float array and a value-sorted index, and
+    closest-fit searches get a KD-tree per combination of measured columns,
+    built with the snapshot so no query pays for it. Facet fields keep a
+    bitmap of positions per value, and batch SKU lookups a SKU-sorted index,
+    built on first use.
+    """
+
+    def __init__(self, rows):
+        self.size = len(rows)
+        self.columns = {name: [row[i] for row in rows] for i, name in enumerate(COLUMNS)}
+
+        self.codes = {}
+        self.dictionaries = {}
+        self.code_postings = {}
+        for field in CATEGORICAL_FIELDS:
+            dictionary = {}
+            codes = array('I')
+            postings = []
+            for position, value in enumerate(self.columns[field]):
+                key = (value or '').lower()
+                code = dictionary.get(key)
+                if code is None:
+                    code = dictionary[key] = len(postings)
+                    postings.append(array('I'))
+                codes.append(code)
+                postings[code].append(position)
+            self.codes[field] = codes
+            self.dictionaries[field] = dictionary
+            self.code_postings[field] = postings
+
+        self.lowered = {}
+        self.ngram_postings = {}
+        for field, _ in FIELD_MATCHES:
+            if field in CATEGORICAL_FIELDS:
+                continue
+            lowered = [(value or '').lower() for value in self.columns[field]]
+            postings = {}
+            for position, value in enumerate(lowered):
+                for gram in ngrams(value):
+                    posting = postings.get(gram)
+                    if posting is None:
+                        posting = postings[gram] = array('I')
+                    posting.append(position)
+            self.lowered[field] = lowered
+            self.ngram_postings[field] = postings
+
+        self.numbers = {}
+        self.sorted_numbers = {}
+        for column in MEASUREMENT_FIELDS.values():
+            numbers = array('d', (math.nan if v is None else v for v in self.columns[column]))
+            order = sorted(
+                (p for p in range(self.size) if not math.isnan(numbers[p])),
+                key=numbers.__getitem__,
+            )
+            self.numbers[column] = numbers
+            self.sorted_numbers[column] = (
+                array('d', (numbers[p] for p in order)),
+                array('I', order),
+            )
+
+        # (lowercase value, display value, bitmap) per distinct value of each
+        # facet field; the display value is the least spelling in code-point
+        # order, as min(field COLLATE "C") over the value's rows
+        self.facet_values = {}
+        for field in FACET_FIELDS:
+            groups = {}
+            labels = {}
+            for position, value in enumerate(self.columns[field]):
+                if not value:
+                    continue
+                key = value.lower()
+                positions = groups.get(key)
+                if positions is None:
+                    positions = groups[key] = []
+                    labels[key] = value
+                elif value < labels[key]:
+                    labels[key] = value
+                positions.append(position)
+            self.facet_values[field] = [
+                (key, labels[key], bitmap(positions, self.size)) for key, positions in groups.items()
+            ]
+
+        self._trees = {columns: self._build_tree(columns) for columns in NEAREST_COLUMN_SETS}
+        self._sku_order = None
+        # Guards the structures built on first use
+        self._build_lock = threading.Lock()
+
+    def range_positions(self, column, low, high):
+        """Positions whose `column` value lies in [low, high], in value order."""
+        values, positions = self.sorted_numbers[column]
+        start = 0 if low is None else bisect_left(values, low)
+        end = len(values) if high is None else bisect_right(values, high)
+        return positions[start:end]
+
+    def match_positions(self, predicates):
+        """Positions of the rows matching every predicate, in id order.
+
+        Returns None when there are no predicates at all.
+        """
+        postings = []
+        checks = []
+        for predicate in predicates:
+            if predicate[0] == 'range':
+                postings.append(self.range_positions(*predicate[1:]))
+                continue
+            _, field, match, needle = predicate
+
+            if field in CATEGORICAL_FIELDS:
+                code = self.dictionaries[field].get(needle)
+                if code is None:
+                    return []
+                postings.append(self.code_postings[field][code])
+                continue
+
+            if len(needle) >= NGRAM:
+                field_postings = self.ngram_postings[field]
+                for gram in ngrams(needle):
+                    posting = field_postings.get(gram)
+                    if posting is None:
+                        return []
+                    postings.append(posting)
+            checks.append((self.lowered[field], match, needle))
+
+        if not postings and not checks:
+            return None
+
+        if postings:
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    return []
+            candidates = sorted(candidates)
+        else:
+            candidates = range(self.size)
+
+        # n-grams only narrow the candidates; substrings and prefixes are verified here
+        for lowered, match, needle in checks:
+            if match == 'prefix':
+                candidates = [p for p in candidates if lowered[p].startswith(needle)]
+            else:
+                candidates = [p for p in candidates if needle in lowered[p]]
+        return candidates
+
+    def facet_counts(self, predicates):
+        """(matching rows, {field: [(value, rows)]}), each facet ignoring its own field's predicates.
+
+        Predicates on facet fields are answered by OR-ing the bitmaps of the
+        values they match and AND-ing those per field; the rest go through
+        match_positions once, since they are shared by every facet.
+        """
+        everything = (1 << self.size) - 1
+        field_masks = {}
+        rest = []
+        for predicate in predicates:
+            if predicate[0] != 'text' or predicate[1] not in self.facet_values:
+                rest.append(predicate)
+                continue
+            _, field, match, needle = predicate
+            mask = 0
+            for key, _, bits in self.facet_values[field]:
+                if key == needle if match == 'equals' else needle in key:
+                    mask |= bits
+            field_masks[field] = field_masks.get(field, everything) & mask
+
+        positions = self.match_positions(tuple(rest))
+        base = everything if positions is None else bitmap(positions, self.size)
+        total = base
+        for mask in field_masks.values():
+            total &= mask
+
+        counts = {}
+        for field, values in self.facet_values.items():
+            mask = base
+            for other, other_mask in field_masks.items():
+                if other != field:
+                    mask &= other_mask
+            counts[field] = [(label, popcount(mask & bits)) for _, label, bits in values]
+        return popcount(total), counts
+
+    def _build_tree(self, columns):
+        """(KD-tree, positions, points) over the rows having every column, coordinates weighted."""
+        values = [np.frombuffer(self.numbers[column], dtype=np.float64) for column in columns]
+        present = ~np.any(np.isnan(np.column_stack(values)), axis=1)
+        points = np.column_stack([
+            value[present] * NEAREST_WEIGHTS[column] for column, value in zip(columns, values)
+        ])
+        positions = np.flatnonzero(present)
+        return cKDTree(points) if len(positions) else None, positions, points
+
+    def _allowed(self, checks, positions):
+        """A mask over a tree's `positions` of the rows passing (field, match, needle) checks."""
+        candidates = self.match_positions(tuple(('text', *check) for check in checks))
+        allowed = np.zeros(self.size, dtype=bool)
+        allowed[np.asarray(candidates, dtype=np.int64)] = True
+        return allowed[positions]
+
+    def nearest(self, target, checks, k):
+        """Up to k (distance, position) pairs closest to `target` among rows passing `checks`.
+
+        Rows at equal distance rank in id order, as in the SQL path, so
+        neighbours are fetched until one lies beyond the k-th match. Under
+        selective filters, once that would mean fetching more neighbours than
+        there are rows passing them, those rows are ranked directly.
+        """
+        columns = tuple(sorted(target))
+        tree, positions, points = self._trees[columns]
+        if tree is None:
+            return []
+        allowed = self._allowed(checks, positions) if checks else None
+        allowed_rows = len(positions) if allowed is None else int(np.count_nonzero(allowed))
+        if not allowed_rows:
+            return []
+
+        point = np.array([target[column] * NEAREST_WEIGHTS[column] for column in columns])
+        count = min(k * NEAREST_OVERFETCH, len(positions))
+        while allowed is None or count <= allowed_rows:
+            distances, indexes = tree.query(point, k=count)
+            distances, indexes = np.atleast_1d(distances), np.atleast_1d(indexes)
+            matches = [
+                (float(distance), int(positions[index]))
+                for distance, index in zip(distances, indexes)
+                if allowed is None or allowed[index]
+            ]
+            if count == len(positions) or (len(matches) >= k and distances[-1] > matches[k - 1][0]):
+                return sorted(matches)[:k]
+            count = min(count * NEAREST_OVERFETCH, len(positions))
+
+        indexes = np.flatnonzero(allowed)
+        distances = np.sqrt(((points[indexes] - point) ** 2).sum(axis=1))
+        ranked = np.lexsort((positions[indexes], distances))[:k]
+        return [(float(distances[i]), int(positions[indexes[i]])) for i in ranked]
+
+    def sku_order(self):
+        """(sorted lowercase SKUs, their positions), equal SKUs in position order."""
+        if self._sku_order is None:
+            with self._build_lock:
+                if self._sku_order is None:
+                    lowered = self.lowered['sku']
+                    order = sorted(range(self.size), key=lowered.__getitem__)
+                    self._sku_order = ([lowered[p] for p in order], array('I', order))
+        return self._sku_order
+
+    def sku_positions(self, keys):
+        """{key: positions of the rows whose lowercase SKU equals it} for keys that match."""
+        skus, order = self.sku_order()
+        matches = {}
+        for key in keys:
+            start = bisect_left(skus, key)
+            end = start
+            while end < len(skus) and skus[end] == key:
+                end += 1
+            if end > start:
+                matches[key] = order[start:end]
+        return matches
+
+    def rows(self, positions):
+        """RESULT_COLUMNS value tuples of the rows at `positions`."""
+        columns = [self.columns[name] for name in RESULT_COLUMNS]
+        return zip(*([column[p] for p in positions] for column in columns))
+
+
+class CatalogStore:
+    """In-memory search engine over torque_rods; Postgres stays the source of truth."""
+
+    def __init__(self):
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self.loaded_at = None
+        self.version = None
+
+    @property
+    def loaded(self):
+        return self._snapshot is not None
+
+    def load(self, engine):
+        """Read torque_rods and atomically swap in a fresh snapshot."""
+        with self._reload_lock:
+            start = time.perf_counter()
+            # One snapshot-isolated read so the version matches the rows
+            with engine.connect().execution_options(isolation_level='REPEATABLE READ') as conn:
+                version = get_catalog_version(conn)
+                rows = conn.execute(
+                    text(f"SELECT {', '.join(COLUMNS)} FROM torque_rods ORDER BY id")
+                ).fetchall()
+            self._snapshot = CatalogSnapshot(rows)
+            self.version = version
+            self.loaded_at = time.time()
+            logger.info(
+                f"Loaded {len(rows)} products (catalog version {version}) into the "
+                f"catalog store in {time.perf_counter() - start:.3f}s"
+            )
+
+    def search(self, search_query):
+        """Answer a search with the same paginated body the SQL path returns.
+
+        Returns None when the query sets no field at all.
+        """
+        snapshot = self._snapshot
+        positions = snapshot.match_positions(search_predicates(search_query))
+        if positions is None:
+            return None
+
+        start = 0
+        if search_query.cursor is not None:
+            # Positions follow id order, so the cursor maps to a position by bisection
+            first = bisect_right(snapshot.columns['id'], search_query.cursor)
+            start = bisect_left(positions, first)
+        page = positions[start:start + search_query.limit + 1]
+        return page_response(search_query, snapshot.rows(page), total=len(positions))
+
+
+    def lookup(self, keys):
+        """{key: [RESULT_COLUMNS values]} of the products whose lowercase SKU equals each key."""
+        snapshot = self._snapshot
+        return {
+            key: list(snapshot.rows(positions))
+            for key, positions in snapshot.sku_positions(keys).items()
+        }
+
+    def facets(self, search_query):
+        """The facet counts body the SQL path returns, zero counts included."""
+        return facets_response(*self._snapshot.facet_counts(search_predicates(search_query)))
+
+    def nearest(self, nearest_query):
+        """The closest-fit body the SQL path returns: top-k rows in either orientation."""
+        snapshot = self._snapshot
+        best = {}
+        for flipped, target, checks in orientations(nearest_query):
+            for distance, position in snapshot.nearest(target, checks, nearest_query.k):
+                if position not in best or distance < best[position][0]:
+                    best[position] = (distance, flipped)
+        ranked = sorted(best, key=lambda position: (best[position][0], position))[:nearest_query.k]
+        return nearest_response(
+            (*values, *best[position]) for position, values in zip(ranked, snapshot.rows(ranked))
+        )
+
+
+class CatalogRefresher(threading.Thread):
+    """Tracks the catalog version and reacts when ingestion bumps it.
+
+    Wakes on a change notification or every `interval` seconds. When the
+    version moved it reloads `store` (if given) and calls each `on_change`
+    callback with the new version. `version` only advances once every
+    callback succeeded, so a failed one is retried on the next wake; pass the
+    version the callbacks are already up to date with, or None to run them
+    on the first refresh.
+    """
+
+    def __init__(self, engine, store=None, on_change=(), interval=CATALOG_REFRESH_SECONDS, version=None):
+        super().__init__(name='catalog-refresher', daemon=True)
+        self.engine = engine
+        self.store = store
+        self.on_change = list(on_change)
+        self.interval = interval
+        self.version = version
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"Catalog refresher failed: {str(e)}")
+                self._stopped.wait(5)
+
+    def refresh(self):
+        with self.engine.connect() as conn:
+            version = get_catalog_version(conn)
+        if self.store is not None and (not self.store.loaded or self.store.version != version):
+            self.store.load(self.engine)
+            version = self.store.version
+        if version == self.version:
+            return
+
+        failed = False
+        for callback in self.on_change:
+            try:
+                callback(version)
+            except Exception as e:
+                logger.error(f"Catalog change callback failed, retrying on the next refresh: {str(e)}")
+                failed = True
+        if not failed:
+            self.version = version
+
+    def _listen(self):
+        # A dedicated connection, detached from the pool, holds the LISTEN
+        raw = self.engine.raw_connection()
+        raw.detach()
+        conn = raw.driver_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CATALOG_CHANNEL}")
+            # Catch up on anything committed while we weren't listening
+            self.refresh()
+
+            while not self._stopped.is_set():
+                ready, _, _ = select.select([conn], [], [], self.interval)
+                if ready:
+                    conn.poll()
+                    if not conn.notifies:
+                        continue
+                    # Let a burst of notifications from one ingestion run settle
+                    time.sleep(0.5)
+                    conn.poll()
+                    conn.notifies.clear()
+                self.refresh()
+        finally:
+            raw.close()
@@ -0,0 +1,295 @@
+"""Stream torque_rods out of Postgres as CSV, NDJSON or Parquet with COPY ... TO STDOUT.
+
+Rows come in id order, optionally filtered by a ProductSearch (vendor
+included), straight from COPY: Postgres renders the CSV, or each row's JSON
+with row_to_json, and Parquet is converted from the CSV with pyarrow in row
+groups of EXPORT_ROW_GROUP_ROWS. COPY writes into a bounded queue read by
+the consumer, so memory stays constant whatever the size of the catalog.
+/api/products/export serves the same streams over HTTP.
+
+    python export.py --format csv --vendor Automann > automann.csv
+    python export.py --format ndjson --search '{"side_a": "Taper", "c_to_c": "19"}' --output taper.ndjson
+    python export.py --format parquet --output torque_rods.parquet
+"""
+import argparse
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, text
+
+from database import DATABASE_URL, engine as default_engine
+from search_filters import RESULT_COLUMNS, ProductSearch, build_conditions, search_predicates
+
+logger = logging.getLogger(__name__)
+
+# Media type of each export format
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Output is handed over in chunks of about this many bytes, with at most
+# EXPORT_QUEUE_CHUNKS of them waiting for a slow reader
+EXPORT_CHUNK_BYTES = int(os.getenv('EXPORT_CHUNK_BYTES', str(64 * 1024)))
+EXPORT_QUEUE_CHUNKS = int(os.getenv('EXPORT_QUEUE_CHUNKS', '8'))
+EXPORT_ROW_GROUP_ROWS = int(os.getenv('EXPORT_ROW_GROUP_ROWS', '65536'))
+# How often a side blocked on the queue checks whether the pipe was closed
+_POLL_SECONDS = 0.1
+
+PARQUET_SCHEMA = pa.schema(
+    [('id', pa.int64())] + [(name, pa.string()) for name in RESULT_COLUMNS if name != 'id']
+)
+
+# COPY statements by format around the SELECT of the rows to export
+_COPY_STATEMENTS = {
+    'csv': "COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER)",
+    'ndjson': "COPY (SELECT row_to_json(products) FROM ({select}) products) TO STDOUT",
+    # Headerless: the Parquet conversion names the columns itself
+    'parquet': "COPY ({select}) TO STDOUT WITH (FORMAT csv)",
+}
+
+
+class ExportCancelled(Exception):
+    """The reader of an export went away before it finished."""
+
+
+class ChunkPipe:
+    """File object carrying bytes from a writer thread to a reader in chunks.
+
+    The writer (psycopg2's COPY, or pyarrow's ParquetWriter) calls write();
+    the reader iterates the chunks, or read()s them as a file. A reader that
+    stops early closes the pipe, and the writer's next write raises
+    ExportCancelled.
+    """
+
+    _DONE = object()
+
+    def __init__(self, transform=None):
+        self._queue = queue.Queue(EXPORT_QUEUE_CHUNKS)
+        self._transform = transform
+        self._buffer = []
+        self._buffered = 0
+        self._written = 0
+        self._pending = b''
+        self._chunks = None
+        self._closed = threading.Event()
+        self.closed = False
+
+    def write(self, data):
+        if self._transform is not None:
+            data = self._transform(data)
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self._written += len(data)
+        if self._buffered >= EXPORT_CHUNK_BYTES:
+            self._put(self._take())
+        return len(data)
+
+    def tell(self):
+        return self._written
+
+    def flush(self):
+        # Chunks are handed over when full; finish() sends the rest
+        pass
+
+    def finish(self, error=None):
+        """Hand over what is buffered and end the stream, with `error` if it failed."""
+        try:
+            if self._buffered:
+                self._put(self._take())
+            self._put(self._DONE if error is None else error)
+        except ExportCancelled:
+            pass
+
+    def close(self):
+        self._closed.set()
+
+    def __iter__(self):
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    # Closed from the reading side: nothing more will be read
+                    if self._closed.is_set():
+                        return
+                    continue
+                if item is self._DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def read(self, size=-1):
+        if self._chunks is None:
+            self._chunks = iter(self)
+        while size < 0 or len(self._pending) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._pending += chunk
+        if size < 0:
+            data, self._pending = self._pending, b''
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def _take(self):
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        return data
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+        raise ExportCancelled()
+
+
+def _unescape_copy_text(data):
+    # COPY's text format doubles backslashes; row_to_json leaves no other
+    # character it escapes, and each write is one whole row
+    return data.replace(b'\\\\', b'\\')
+
+
+def export_query(search_query):
+    """The SELECT of the rows to export, in id order, and its bind parameters."""
+    conditions, params = build_conditions(search_predicates(search_query))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return text(f"SELECT {', '.join(RESULT_COLUMNS)} FROM torque_rods {where} ORDER BY id"), params
+
+
+def _run_copy(connection, copy_format, select, params, pipe):
+    """Run a COPY ... TO STDOUT of `select` into `pipe`, then give back the connection."""
+    try:
+        cursor = connection.connection.driver_connection.cursor()
+        try:
+            # COPY takes no bind parameters, so psycopg2 renders them inline
+            select = cursor.mogrify(select, params).decode()
+            cursor.copy_expert(_COPY_STATEMENTS[copy_format].format(select=select), pipe)
+        finally:
+            cursor.close()
+        connection.rollback()
+        pipe.finish()
+    except ExportCancelled:
+        # Abandoned mid-COPY: the connection is still in the copy state
+        logger.info("Export cancelled by its reader")
+        connection.invalidate()
+    except Exception as e:
+        logger.error(f"Export failed: {str(e)}")
+        connection.invalidate()
+        pipe.finish(e)
+    finally:
+        connection.close()
+
+
+def _convert_parquet(source, pipe):
+    """Convert headerless CSV read from `source` into Parquet row groups written to `pipe`."""
+    reader = pa_csv.open_csv(
+        pa.PythonFile(source, mode='r'),
+        read_options=pa_csv.ReadOptions(column_names=PARQUET_SCHEMA.names),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        # COPY writes NULL unquoted and an empty string as ""
+        convert_options=pa_csv.ConvertOptions(
+            column_types=PARQUET_SCHEMA, strings_can_be_null=True, quoted_strings_can_be_null=False,
+        ),
+    )
+    with pq.ParquetWriter(pipe, PARQUET_SCHEMA) as writer:
+        pending = pa.Table.from_batches([], PARQUET_SCHEMA)
+        for batch in reader:
+            pending = pa.concat_tables([pending, pa.Table.from_batches([batch])])
+            while pending.num_rows >= EXPORT_ROW_GROUP_ROWS:
+                writer.write_table(pending.slice(0, EXPORT_ROW_GROUP_ROWS))
+                pending = pending.slice(EXPORT_ROW_GROUP_ROWS)
+        if pending.num_rows:
+            writer.write_table(pending)
+
+
+def _write_parquet(source, pipe):
+    try:
+        _convert_parquet(source, pipe)
+    except ExportCancelled:
+        source.close()
+    except Exception as e:
+        logger.error(f"Parquet export failed: {str(e)}")
+        source.close()
+        pipe.finish(e)
+    else:
+        # Only once the CSV reader and its threads are gone: a CLI reading
+        # the last chunk exits right away
+        pipe.finish()
+
+
+def _start(target, *args):
+    threading.Thread(target=target, args=args, daemon=True).start()
+
+
+def export_stream(search_query, export_format, engine=default_engine):
+    """Start exporting the rows matching `search_query`; returns an iterator of output chunks.
+
+    The connection is checked out before returning, so a database that is
+    down raises here rather than partway through the stream.
+    """
+    statement, params = export_query(search_query)
+    select = str(statement.compile(dialect=engine.dialect))
+    connection = engine.connect()
+
+    if export_format == 'parquet':
+        source = ChunkPipe()
+        pipe = ChunkPipe()
+        _start(_run_copy, connection, export_format, select, params, source)
+        _start(_write_parquet, source, pipe)
+        return iter(pipe)
+
+    pipe = ChunkPipe(transform=_unescape_copy_text if export_format == 'ndjson' else None)
+    _start(_run_copy, connection, export_format, select, params, pipe)
+    return iter(pipe)
+
+
+def export_search(search_query=None, vendor=None):
+    """The ProductSearch an export filters on, with `vendor` set over its own."""
+    search_query = search_query or ProductSearch()
+    if vendor:
+        search_query = search_query.model_copy(update={'vendor': vendor})
+    return search_query
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--vendor', help='only this vendor\'s products')
+    parser.add_argument('--search', help='a ProductSearch as JSON to filter on')
+    parser.add_argument('--output', help='file to write (default: stdout)')
+    parser.add_argument('--database-url', default=DATABASE_URL)
+    args = parser.parse_args()
+
+    search_query = export_search(
+        ProductSearch.model_validate_json(args.search) if args.search else None, args.vendor,
+    )
+    engine = default_engine if args.database_url == DATABASE_URL else create_engine(args.database_url)
+    start = time.perf_counter()
+    size = 0
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_stream(search_query, args.format, engine):
+            output.write(chunk)
+            size += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+    logger.info(f"Exported {size} bytes of {args.format} in {time.perf_counter() - start:.1f}s")
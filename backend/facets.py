@@ -0,0 +1,23 @@
+# Fields whose distinct values are counted for the search form's dropdowns.
+# Counts come from the catalog store's bitmaps only: there is no per-request
+# GROUP BY over torque_rods
+FACET_FIELDS = ['type1', 'side_a', 'side_b', 'vendor', 'side_a_bushing', 'side_b_bushing']
+
+
+def facet_predicates(predicates, field):
+    """The predicates a facet is counted under: everything except its own field's."""
+    return tuple(predicate for predicate in predicates if not (predicate[0] == 'text' and predicate[1] == field))
+
+
+def facets_response(total, counts):
+    """The response body from the matching row count and {field: [(value, rows)]}."""
+    return {
+        "total": total,
+        "facets": {
+            field: [
+                {"value": value, "rows": rows}
+                for value, rows in sorted(counts[field], key=lambda count: count[0].lower())
+            ]
+            for field in FACET_FIELDS
+        },
+    }
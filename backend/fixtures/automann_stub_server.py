@@ -0,0 +1,96 @@
+"""Serve stand-in Automann HTTP responses for the HTTP scraper backend.
+
+Serves fixtures/automann_http/responses.json, hand-written responses for
+the endpoints automann_http.py assumes (not captured from the live site,
+whose JSON endpoints are unverified). Each entry is matched on
+method, path and query string and replayed with its status, headers and
+body. Entries marked "auth" answer 401 until the login POST has set the
+session cookie. --delay-ms adds latency per request, so concurrency shows:
+
+    python fixtures/automann_stub_server.py --port 8766 --delay-ms 50
+    AUTOMANN_URL=http://127.0.0.1:8766 AUTOMANN_USERNAME=demo AUTOMANN_PASSWORD=demo \\
+        python automann_http.py --no-upload
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+RESPONSES = Path(__file__).resolve().parent / 'automann_http' / 'responses.json'
+SESSION_COOKIE = 'PHPSESSID=fixture-session'
+
+
+def request_key(method, path, query):
+    return method, path, urlencode(sorted(parse_qsl(query)))
+
+
+def load_responses(path=RESPONSES):
+    with open(path, encoding='utf-8') as f:
+        return {
+            request_key(entry['method'], entry['path'], entry['query']): entry
+            for entry in json.load(f)
+        }
+
+
+def make_handler(responses, delay=0.0):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def replay(self):
+            if delay:
+                time.sleep(delay)
+            url = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+
+            entry = responses.get(request_key(self.command, url.path, url.query))
+            if entry is None:
+                self.send_error(404)
+                return
+            if entry.get('auth') and SESSION_COOKIE not in (self.headers.get('Cookie') or ''):
+                self.send_error(401)
+                return
+
+            body = entry['body']
+            if not isinstance(body, str):
+                body = json.dumps(body)
+            payload = body.encode('utf-8')
+            self.send_response(entry['status'])
+            if 'content_type' in entry:
+                self.send_header('Content-Type', entry['content_type'])
+            for name, value in entry.get('headers', {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = replay
+        do_POST = replay
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+
+def serve(port=8766, delay=0.0, responses=RESPONSES):
+    """Start the stub server on a background thread and return it."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(load_responses(responses), delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--delay-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.delay_ms / 1000)
+    print(f'Replaying {RESPONSES} on http://127.0.0.1:{args.port}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,91 @@
+from sqlalchemy import bindparam, text
+
+from product_fields import fits
+from search_filters import RESULT_COLUMNS
+
+_MEMBER = ', '.join(f"'{name}', {name}" for name in RESULT_COLUMNS)
+
+# Rebuild the groups of the given fit keys (every key when :all_keys) from
+# torque_rods; keys left with fewer than two products lose their group row
+_REFRESH = text(f"""
+    WITH groups AS (
+        SELECT fit_key,
+               count(*) AS product_count,
+               count(DISTINCT lower(vendor)) AS vendor_count,
+               jsonb_agg(jsonb_build_object({_MEMBER}) ORDER BY vendor, sku) AS products
+        FROM torque_rods
+        WHERE fit_key IS NOT NULL AND (:all_keys OR fit_key IN :fit_keys)
+        GROUP BY fit_key
+        HAVING count(*) > 1
+    ),
+    upserted AS (
+        INSERT INTO torque_rod_interchange (fit_key, product_count, vendor_count, products, updated_at)
+        SELECT fit_key, product_count, vendor_count, products, now() FROM groups
+        ON CONFLICT (fit_key) DO UPDATE
+        SET product_count = EXCLUDED.product_count,
+            vendor_count = EXCLUDED.vendor_count,
+            products = EXCLUDED.products,
+            updated_at = now()
+        RETURNING fit_key
+    ),
+    deleted AS (
+        DELETE FROM torque_rod_interchange
+        WHERE (:all_keys OR fit_key IN :fit_keys)
+          AND fit_key NOT IN (SELECT fit_key FROM upserted)
+        RETURNING fit_key
+    )
+    SELECT (SELECT count(*) FROM upserted), (SELECT count(*) FROM deleted)
+""").bindparams(bindparam('fit_keys', expanding=True))
+
+# One probe of the lower(sku) index joined to the group on its primary key
+EQUIVALENTS_QUERY = text("""
+    SELECT t.id, t.vendor, t.sku, i.products
+    FROM torque_rods t
+    LEFT JOIN torque_rod_interchange i ON i.fit_key = t.fit_key
+    WHERE lower(t.sku) = lower(:sku)
+    ORDER BY t.id
+""")
+
+
+def refresh_interchange(conn, fit_keys=None):
+    """Recompute interchange groups in the caller's transaction.
+
+    Pass the fit keys whose members changed (old and new keys of updated
+    rows) to touch only those groups, or None to rebuild every group.
+    Returns (groups written, groups removed).
+    """
+    if fit_keys is not None:
+        fit_keys = sorted({key for key in fit_keys if key})
+        if not fit_keys:
+            return 0, 0
+    written, removed = conn.execute(_REFRESH, {
+        'all_keys': fit_keys is None,
+        'fit_keys': fit_keys or [''],
+    }).one()
+    return written, removed
+
+
+def equivalents_response(sku, rows):
+    """Shape EQUIVALENTS_QUERY rows; None when no product has that SKU.
+
+    `products` are the rows matching the SKU (one per vendor listing it) and
+    `equivalents` every other member of their interchange groups that fits
+    them, per product_fields.fits().
+    """
+    if not rows:
+        return None
+    matched = {row.id for row in rows}
+    equivalents = {}
+    for row in rows:
+        members = row.products or []
+        product = next((member for member in members if member['id'] == row.id), None)
+        for member in members:
+            if member['id'] not in matched and product is not None and fits(product, member):
+                equivalents[member['id']] = member
+    return {
+        'sku': sku,
+        'products': [{'id': row.id, 'vendor': row.vendor, 'sku': row.sku} for row in rows],
+        'equivalents': sorted(
+            equivalents.values(), key=lambda member: (member['vendor'] or '', member['sku'] or '')
+        ),
+    }
@@ -0,0 +1,85 @@
+import csv
+import io
+import os
+from typing import List
+
+import orjson
+from pydantic import BaseModel, Field
+from sqlalchemy import String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from metrics import SKU_LOOKUPS
+from search_filters import RESULT_COLUMNS
+
+# SKUs resolved per query and streamed per chunk
+LOOKUP_CHUNK_SIZE = int(os.getenv('LOOKUP_CHUNK_SIZE', '1000'))
+MAX_LOOKUP_SKUS = int(os.getenv('MAX_LOOKUP_SKUS', '20000'))
+
+# One probe of ix_torque_rods_sku_lower per distinct key of the chunk
+LOOKUP_QUERY = text(f"""
+    SELECT lower(sku) AS sku_key, {', '.join(RESULT_COLUMNS)}
+    FROM torque_rods
+    WHERE lower(sku) = ANY(:keys)
+    ORDER BY id
+""").bindparams(bindparam('keys', type_=ARRAY(String)))
+
+# Last line of a stream cut short by a database error
+LOOKUP_ERROR_LINE = orjson.dumps({"error": "Database error occurred while looking up SKUs"}) + b'\n'
+
+
+class SkuLookup(BaseModel):
+    skus: List[str] = Field(min_length=1, max_length=MAX_LOOKUP_SKUS)
+
+
+def sku_key(sku):
+    """The normalized SKU that lower(sku) is compared with."""
+    return sku.strip().lower()
+
+
+def read_csv_skus(body):
+    """SKUs from an uploaded CSV: its `sku` column when the header names one, else the first column."""
+    rows = [row for row in csv.reader(io.StringIO(body.decode('utf-8-sig'))) if row]
+    column = 0
+    if rows:
+        header = [cell.strip().lower() for cell in rows[0]]
+        if 'sku' in header:
+            column = header.index('sku')
+            rows = rows[1:]
+    return [row[column] for row in rows if len(row) > column and row[column].strip()]
+
+
+def lookup_chunks(skus):
+    """Split the SKUs into (chunk, distinct non-blank keys to resolve for it)."""
+    for start in range(0, len(skus), LOOKUP_CHUNK_SIZE):
+        chunk = skus[start:start + LOOKUP_CHUNK_SIZE]
+        yield chunk, sorted({key for key in map(sku_key, chunk) if key})
+
+
+def group_matches(rows):
+    """{key: [RESULT_COLUMNS values]} from LOOKUP_QUERY rows."""
+    matches = {}
+    for key, *values in rows:
+        matches.setdefault(key, []).append(values)
+    return matches
+
+
+def lookup_lines(skus, matches):
+    """NDJSON for a chunk: one line per submitted SKU, in order, matched or miss.
+
+    `matches` maps keys to the RESULT_COLUMNS values of the products whose
+    SKU they equal, ignoring case and surrounding whitespace.
+    """
+    lines = []
+    matched = 0
+    for sku in skus:
+        products = matches.get(sku_key(sku), ())
+        matched += bool(products)
+        lines.append(orjson.dumps({
+            "sku": sku,
+            "status": "matched" if products else "miss",
+            "products": [dict(zip(RESULT_COLUMNS, values)) for values in products],
+        }))
+    lines.append(b'')
+    SKU_LOOKUPS.labels('matched').inc(matched)
+    SKU_LOOKUPS.labels('miss').inc(len(skus) - matched)
+    return b'\n'.join(lines)
@@ -1,13 +1,40 @@
 import os
 import logging
 import time
-from fastapi import FastAPI, Depends, HTTPException, Request
+from functools import partial
+from typing import Literal, Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from database import get_db, Product
+from database import AsyncSessionLocal, SessionLocal, async_engine, get_async_db, get_db, engine, Product
+from catalog_store import CatalogStore, CatalogRefresher
+from search_filters import (
+    ProductSearch, build_count_query, build_search_query, page_response, read_count, search_key,
+)
+from export import EXPORT_FORMATS, export_search, export_stream
+from interchange import EQUIVALENTS_QUERY, equivalents_response
+from lookup import (
+    LOOKUP_ERROR_LINE, LOOKUP_QUERY, SkuLookup, group_matches, lookup_chunks, lookup_lines, read_csv_skus,
+)
+from nearest import (
+    NearestSearch, build_nearest_query, nearest_radii, nearest_response, nearest_settled, nearest_target,
+)
+from response_encoding import EMPTY_SEARCH, encode_page, page_http_response
+from query_cache import QueryCache
+from single_flight import ClientDisconnected, SingleFlight, client_disconnected
+from suggest import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, SUGGEST_FIELDS, SuggestIndex
+from db_pool import pool_metrics
+from metrics import (
+    REQUEST_SECONDS, SEARCH_SERIALIZE_SECONDS, explain_slow_query, explain_slow_query_async,
+    record_search, render_metrics, route_label,
+)
 from sqlalchemy import text
-from pydantic import BaseModel
 
 # Configure logging
 logging.basicConfig(
@@ -21,9 +48,10 @@ app = FastAPI()
 # Add middleware for request logging
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    duration = time.time() - start_time
+    duration = time.perf_counter() - start_time
+    REQUEST_SECONDS.labels(request.method, route_label(request), response.status_code).observe(duration)
     logger.info(
         f"Method: {request.method} Path: {request.url.path} "
         f"Duration: {duration:.3f}s Status: {response.status_code}"
@@ -42,29 +70,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# "memory" answers searches from the in-process catalog store, "postgres" queries the DB
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "memory")
+API_DB_MODE = os.getenv("API_DB_MODE", "async")
+catalog = CatalogStore()
+search_cache = QueryCache()
+search_flights = SingleFlight()
+suggestions = SuggestIndex()
+
+@app.on_event("startup")
+def load_catalog():
+    store = None
+    if SEARCH_BACKEND == "memory":
+        store = catalog
+        try:
+            catalog.load(engine)
+        except Exception as e:
+            logger.error(f"Catalog store load failed, searching Postgres instead: {str(e)}")
+    loaded_version = None
+    try:
+        suggestions.load(engine)
+        loaded_version = catalog.version
+    except Exception as e:
+        logger.error(f"Suggestion index load failed: {str(e)}")
+    # Reloads the store (retrying a failed initial load) and the suggestions,
+    # and drops cached results whenever ingestion bumps the catalog version;
+    # a failed initial suggestion load is retried on the first refresh
+    app.state.catalog_refresher = CatalogRefresher(
+        engine, store=store, version=loaded_version, on_change=[
+            lambda version: search_cache.clear(),
+            lambda version: suggestions.load(engine),
+        ]
+    )
+    app.state.catalog_refresher.start()
+
+@app.on_event("shutdown")
+def stop_catalog_refresher():
+    refresher = getattr(app.state, "catalog_refresher", None)
+    if refresher:
+        refresher.stop()
 
-from typing import Optional
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
 
-class ProductSearch(BaseModel):
-    sku: Optional[str] = None
-    type1: Optional[str] = None
-    type2: Optional[str] = None
-    c_to_c: Optional[str] = None
-    side_a: Optional[str] = None
-    side_b: Optional[str] = None
-    side_a_bushing: Optional[str] = None
-    side_b_bushing: Optional[str] = None
-    side_a_angle: Optional[str] = None
-    side_b_angle: Optional[str] = None
-    shaft_dia: Optional[str] = None
-    notes: Optional[str] = None
-    vendor: Optional[str] = None
+def catalog_version():
+    refresher = getattr(app.state, "catalog_refresher", None)
+    return refresher.version if refresher else None
 
-@app.get("/")
-def read_root():
+def read_root(db: Session = Depends(get_db)):
     try:
         # Test database connection
-        db = next(get_db())
         db.execute(text("SELECT 1"))
         logger.info("Database connection successful")
         return {"message": "Welcome to the Product Search API", "status": "healthy"}
@@ -75,72 +131,185 @@ def read_root():
             detail="Database connection error. Please try again later."
         )
 
-@app.post("/api/products/search")
-def search_products(search_query: ProductSearch, db: Session = Depends(get_db)):
+async def read_root_async(db: AsyncSession = Depends(get_async_db)):
+    try:
+        # Test database connection
+        await db.execute(text("SELECT 1"))
+        logger.info("Database connection successful")
+        return {"message": "Welcome to the Product Search API", "status": "healthy"}
+    except Exception as e:
+        logger.error(f"Database connection failed: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Database connection error. Please try again later."
+        )
+
+def check_database():
+    # The context manager returns the connection to the pool even on error
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+async def check_database_async():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+def readiness(database_ok):
+    """Ready once the DB answers and, in memory mode, the catalog store is loaded."""
+    catalog_ok = SEARCH_BACKEND != "memory" or catalog.loaded
+    status = {"database": database_ok, "catalog": catalog_ok}
+    if not (database_ok and catalog_ok):
+        raise HTTPException(status_code=503, detail=status)
+    return {"status": "ready", **status}
+
+def healthz():
+    try:
+        check_database()
+    except Exception as e:
+        logger.error(f"Health check failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok"}
+
+async def healthz_async():
+    try:
+        await check_database_async()
+    except Exception as e:
+        logger.error(f"Health check failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok"}
+
+def readyz():
+    try:
+        check_database()
+        database_ok = True
+    except Exception as e:
+        logger.error(f"Readiness check failed: {str(e)}")
+        database_ok = False
+    return readiness(database_ok)
+
+async def readyz_async():
+    try:
+        await check_database_async()
+        database_ok = True
+    except Exception as e:
+        logger.error(f"Readiness check failed: {str(e)}")
+        database_ok = False
+    return readiness(database_ok)
+
+def search_without_db(search_query):
+    """Answer from the result cache or the catalog store.
+
+    Returns (cache_key, response); response is None when Postgres has to be
+    queried.
+    """
+    start = time.perf_counter()
+    cache_key = (catalog_version(), search_key(search_query))
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Serving {cached.rows} products from the search cache")
+        record_search(search_query, "cache", time.perf_counter() - start, cached.rows)
+        return cache_key, cached
+
+    if catalog.loaded:
+        response = catalog.search(search_query)
+        if response is None:
+            return cache_key, EMPTY_SEARCH
+        search_seconds = time.perf_counter() - start
+        page = encode_page(response)
+        SEARCH_SERIALIZE_SECONDS.observe(time.perf_counter() - start - search_seconds)
+        logger.info(f"Found {page.rows} matching products in catalog store")
+        record_search(search_query, "memory", search_seconds, page.rows)
+        search_cache.put(cache_key, page)
+        return cache_key, page
+
+    return cache_key, None
+
+def search_json(request, page):
+    """Send an encoded search page, compressed as the client's Accept-Encoding allows."""
+    return page_http_response(page, request.headers.get("accept-encoding"))
+
+def finish_db_search(search_query, cache_key, result, total):
+    """Encode the page straight from the query result, timing it apart from the DB work."""
+    start = time.perf_counter()
+    page = encode_page(page_response(
+        search_query, result, total=total,
+        estimate=search_query.count == 'approximate',
+    ))
+    SEARCH_SERIALIZE_SECONDS.observe(time.perf_counter() - start)
+    logger.info(f"Found {page.rows} matching products")
+    search_cache.put(cache_key, page)
+    return page
+
+def run_search_query(search_query, cache_key, query, params, flight):
+    """Run a search in Postgres for every request coalesced on it.
+
+    Uses its own session rather than a request's, as the flight outlives
+    any request that leaves it.
+    """
+    with SessionLocal() as db:
+        # psycopg2 sends the cancel request from any thread; the hook is
+        # disarmed before the session returns the connection to the pool
+        with flight.cancelling(db.connection().connection.dbapi_connection.cancel):
+            start = time.perf_counter()
+            total = None
+            if search_query.count:
+                count_query, count_params = build_count_query(search_query)
+                total = read_count(search_query, db.execute(count_query, count_params).scalar())
+            result = db.execute(query, params)
+            db_seconds = time.perf_counter() - start
+
+            page = finish_db_search(search_query, cache_key, result, total)
+            if record_search(search_query, "postgres", db_seconds, page.rows):
+                explain_slow_query(db, search_query, db_seconds, query, params)
+            return page
+
+async def run_search_query_async(search_query, cache_key, query, params, flight):
+    """Async counterpart of run_search_query; cancelling its task cancels the statement."""
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        total = None
+        if search_query.count:
+            count_query, count_params = build_count_query(search_query)
+            count = (await db.execute(count_query, count_params)).scalar()
+            total = read_count(search_query, count)
+        result = await db.execute(query, params)
+        db_seconds = time.perf_counter() - start
+
+        # The result is buffered, so it can be encoded off the event loop
+        page = await run_in_threadpool(finish_db_search, search_query, cache_key, result, total)
+        if record_search(search_query, "postgres", db_seconds, page.rows):
+            await explain_slow_query_async(db, search_query, db_seconds, query, params)
+        return page
+
+async def search_products(search_query: ProductSearch, request: Request):
+    # Runs on the event loop to coalesce searches and watch for disconnects;
+    # the store search, encoding and queries run on the threadpool
     logger.info(f"Received search query: {search_query.dict(exclude_none=True)}")
     try:
+        # The store's search and the page encoding are CPU work: off the event loop
+        cache_key, response = await run_in_threadpool(search_without_db, search_query)
+        if response is not None:
+            return await run_in_threadpool(search_json, request, response)
+
         # Using parameterized query to prevent SQL injection
-        # Build the WHERE clause dynamically based on non-null fields
-        conditions = []
-        params = {}
-
-        if search_query.sku:
-            conditions.append("sku ILIKE :sku")
-            params['sku'] = f'%{search_query.sku}%'
-        if search_query.type1:
-            conditions.append("type1 ILIKE :type1")
-            params['type1'] = f'{search_query.type1}'
-        if search_query.type2:
-            conditions.append("type2 ILIKE :type2")
-            params['type2'] = f'%{search_query.type2}%'
-        if search_query.c_to_c:
-            conditions.append("c_to_c ILIKE :c_to_c")
-            params['c_to_c'] = f'{search_query.c_to_c}%'
-        if search_query.side_a:
-            conditions.append("side_a ILIKE :side_a")
-            params['side_a'] = f'{search_query.side_a}'
-        if search_query.side_b:
-            conditions.append("side_b ILIKE :side_b")
-            params['side_b'] = f'{search_query.side_b}'
-        if search_query.side_a_bushing:
-            conditions.append("side_a_bushing ILIKE :side_a_bushing")
-            params['side_a_bushing'] = f'%{search_query.side_a_bushing}%'
-        if search_query.side_b_bushing:
-            conditions.append("side_b_bushing ILIKE :side_b_bushing")
-            params['side_b_bushing'] = f'%{search_query.side_b_bushing}%'
-        if search_query.side_a_angle:
-            conditions.append("side_a_angle ILIKE :side_a_angle")
-            params['side_a_angle'] = f'%{search_query.side_a_angle}%'
-        if search_query.side_b_angle:
-            conditions.append("side_b_angle ILIKE :side_b_angle")
-            params['side_b_angle'] = f'%{search_query.side_b_angle}%'
-        if search_query.shaft_dia:
-            conditions.append("shaft_dia ILIKE :shaft_dia")
-            params['shaft_dia'] = f'%{search_query.shaft_dia}%'
-        if search_query.vendor:
-            conditions.append("vendor ILIKE :vendor")
-            params['vendor'] = f'{search_query.vendor}'
-
-        # If no search criteria provided, return empty list
-        if not conditions:
-            return []
-
-        # Combine all conditions with AND
-        where_clause = " AND ".join(conditions)
-        
-        query = text(f"""
-            SELECT * FROM torque_rods 
-            WHERE {where_clause}
-        """)
+        query, params = build_search_query(search_query)
+
+        # If no search criteria provided, return an empty page
+        if query is None:
+            return search_json(request, EMPTY_SEARCH)
 
         logger.debug(f"Executing query: {query}")
         logger.debug(f"Query parameters: {params}")
         
         try:
-            result = db.execute(query, params)
-            products = [dict(row._mapping) for row in result]
-            logger.info(f"Found {len(products)} matching products")
-            return {"products": products}
+            page = await search_flights.run(
+                cache_key,
+                partial(run_in_threadpool, run_search_query, search_query, cache_key, query, params),
+                partial(client_disconnected, request),
+            )
+            return await run_in_threadpool(search_json, request, page)
+        except ClientDisconnected:
+            logger.info("Client disconnected before its search was answered")
+            return Response(status_code=499)
         except SQLAlchemyError as e:
             logger.error(f"Database error during product search: {str(e)}")
             raise HTTPException(
@@ -154,6 +323,266 @@ def search_products(search_query: ProductSearch, db: Session = Depends(get_db)):
             detail="An unexpected error occurred while processing your request"
         )
 
+async def search_products_async(search_query: ProductSearch, request: Request):
+    logger.info(f"Received search query: {search_query.dict(exclude_none=True)}")
+    try:
+        # The store's search and the page encoding are CPU work: off the event loop
+        cache_key, response = await run_in_threadpool(search_without_db, search_query)
+        if response is not None:
+            return await run_in_threadpool(search_json, request, response)
+
+        # Using parameterized query to prevent SQL injection
+        query, params = build_search_query(search_query)
+
+        # If no search criteria provided, return an empty page
+        if query is None:
+            return search_json(request, EMPTY_SEARCH)
+
+        logger.debug(f"Executing query: {query}")
+        logger.debug(f"Query parameters: {params}")
+
+        try:
+            page = await search_flights.run(
+                cache_key,
+                partial(run_search_query_async, search_query, cache_key, query, params),
+                partial(client_disconnected, request),
+            )
+            return await run_in_threadpool(search_json, request, page)
+        except ClientDisconnected:
+            logger.info("Client disconnected before its search was answered")
+            return Response(status_code=499)
+        except SQLAlchemyError as e:
+            logger.error(f"Database error during product search: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail="Database error occurred while searching products"
+            )
+    except Exception as e:
+        logger.error(f"Error processing search request: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred while processing your request"
+        )
+
+def get_equivalents(sku: str, db: Session = Depends(get_db)):
+    try:
+        rows = db.execute(EQUIVALENTS_QUERY, {"sku": sku}).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during equivalents lookup: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Database error occurred while looking up equivalents"
+        )
+    response = equivalents_response(sku, rows)
+    if response is None:
+        raise HTTPException(status_code=404, detail=f"No product with SKU {sku}")
+    return response
+
+async def get_equivalents_async(sku: str, db: AsyncSession = Depends(get_async_db)):
+    try:
+        rows = (await db.execute(EQUIVALENTS_QUERY, {"sku": sku})).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during equivalents lookup: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Database error occurred while looking up equivalents"
+        )
+    response = equivalents_response(sku, rows)
+    if response is None:
+        raise HTTPException(status_code=404, detail=f"No product with SKU {sku}")
+    return response
+
+def product_facets(search_query: ProductSearch, request: Request):
+    # Counted from the catalog store's bitmaps, in the threadpool in both modes;
+    # Postgres is never scanned for them
+    if not catalog.loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Facet counts need the catalog store, which is not loaded"
+        )
+    return search_json(request, encode_page(catalog.facets(search_query), rows=0))
+
+def check_nearest_query(nearest_query):
+    try:
+        nearest_target(nearest_query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def nearest_products(nearest_query: NearestSearch, request: Request, db: Session = Depends(get_db)):
+    check_nearest_query(nearest_query)
+    if catalog.loaded:
+        return search_json(request, encode_page(catalog.nearest(nearest_query)))
+
+    try:
+        # Widen the window until no row outside it could make the top k
+        for radius in nearest_radii(nearest_query):
+            query, params = build_nearest_query(nearest_query, radius)
+            rows = db.execute(query, params).all()
+            if nearest_settled(nearest_query, rows, radius):
+                break
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during nearest search: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Database error occurred while ranking products"
+        )
+    return search_json(request, encode_page(nearest_response(rows)))
+
+async def nearest_products_async(
+    nearest_query: NearestSearch, request: Request, db: AsyncSession = Depends(get_async_db)
+):
+    check_nearest_query(nearest_query)
+    if catalog.loaded:
+        return search_json(request, encode_page(catalog.nearest(nearest_query)))
+
+    try:
+        # Widen the window until no row outside it could make the top k
+        for radius in nearest_radii(nearest_query):
+            query, params = build_nearest_query(nearest_query, radius)
+            rows = (await db.execute(query, params)).all()
+            if nearest_settled(nearest_query, rows, radius):
+                break
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during nearest search: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Database error occurred while ranking products"
+        )
+    return search_json(request, encode_page(nearest_response(rows)))
+
+async def read_lookup_skus(request):
+    """The SKUs of a lookup request: a JSON {"skus": [...]} body or a text/csv upload."""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        if content_type in ("text/csv", "application/csv"):
+            return SkuLookup(skus=read_csv_skus(body)).skus
+        if content_type in ("application/json", ""):
+            return SkuLookup.model_validate_json(body).skus
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV uploads must be UTF-8")
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    raise HTTPException(status_code=415, detail="Send JSON {\"skus\": [...]} or a text/csv body")
+
+def lookup_stream(chunks):
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+def lookup_from_store(skus):
+    for chunk, keys in lookup_chunks(skus):
+        yield lookup_lines(chunk, catalog.lookup(keys))
+
+def lookup_from_db(skus):
+    # Its own session: the stream is still being read after the endpoint returns
+    try:
+        with SessionLocal() as db:
+            for chunk, keys in lookup_chunks(skus):
+                matches = group_matches(db.execute(LOOKUP_QUERY, {"keys": keys})) if keys else {}
+                yield lookup_lines(chunk, matches)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during SKU lookup: {str(e)}")
+        yield LOOKUP_ERROR_LINE
+
+async def lookup_from_db_async(skus):
+    try:
+        async with AsyncSessionLocal() as db:
+            for chunk, keys in lookup_chunks(skus):
+                matches = group_matches(await db.execute(LOOKUP_QUERY, {"keys": keys})) if keys else {}
+                yield lookup_lines(chunk, matches)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during SKU lookup: {str(e)}")
+        yield LOOKUP_ERROR_LINE
+
+async def lookup_products(request: Request):
+    # Streamed chunk by chunk, a line per SKU; the sync generators run in the threadpool
+    skus = await read_lookup_skus(request)
+    logger.info(f"Looking up {len(skus)} SKUs")
+    if catalog.loaded:
+        return lookup_stream(lookup_from_store(skus))
+    return lookup_stream(lookup_from_db(skus))
+
+async def lookup_products_async(request: Request):
+    skus = await read_lookup_skus(request)
+    logger.info(f"Looking up {len(skus)} SKUs")
+    if catalog.loaded:
+        return lookup_stream(lookup_from_store(skus))
+    return lookup_stream(lookup_from_db_async(skus))
+
+# "async" serves the DB-backed endpoints on the event loop through asyncpg,
+# "sync" runs them in the threadpool on psycopg2 sessions
+if API_DB_MODE == "async":
+    app.add_api_route("/", read_root_async, methods=["GET"])
+    app.add_api_route("/healthz", healthz_async, methods=["GET"])
+    app.add_api_route("/readyz", readyz_async, methods=["GET"])
+    app.add_api_route("/api/products/search", search_products_async, methods=["POST"])
+    app.add_api_route("/api/products/nearest", nearest_products_async, methods=["POST"])
+    app.add_api_route("/api/products/facets", product_facets, methods=["POST"])
+    app.add_api_route("/api/products/lookup", lookup_products_async, methods=["POST"])
+    app.add_api_route("/api/products/{sku}/equivalents", get_equivalents_async, methods=["GET"])
+else:
+    app.add_api_route("/", read_root, methods=["GET"])
+    app.add_api_route("/healthz", healthz, methods=["GET"])
+    app.add_api_route("/readyz", readyz, methods=["GET"])
+    app.add_api_route("/api/products/search", search_products, methods=["POST"])
+    app.add_api_route("/api/products/nearest", nearest_products, methods=["POST"])
+    app.add_api_route("/api/products/facets", product_facets, methods=["POST"])
+    app.add_api_route("/api/products/lookup", lookup_products, methods=["POST"])
+    app.add_api_route("/api/products/{sku}/equivalents", get_equivalents, methods=["GET"])
+
+@app.get("/api/pool/metrics")
+def connection_pool_metrics():
+    return {
+        "mode": API_DB_MODE,
+        "sync": pool_metrics(engine.pool),
+        "async": pool_metrics(async_engine.sync_engine.pool),
+    }
+
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/suggest")
+async def suggest(
+    field: str,
+    prefix: str = "",
+    limit: int = Query(DEFAULT_SUGGESTIONS, ge=1, le=MAX_SUGGESTIONS),
+):
+    # Served on the event loop: a lookup is a bisection, cheaper than a threadpool hop
+    if field not in SUGGEST_FIELDS:
+        raise HTTPException(status_code=400, detail=f"field must be one of {', '.join(SUGGEST_FIELDS)}")
+    if not suggestions.loaded:
+        raise HTTPException(status_code=503, detail="Suggestions are not loaded yet")
+    return {"field": field, "prefix": prefix, "suggestions": suggestions.suggest(field, prefix, limit)}
+
+@app.api_route("/api/products/export", methods=["GET", "POST"])
+def export_products(
+    search_query: Optional[ProductSearch] = None,
+    vendor: Optional[str] = None,
+    export_format: Literal["csv", "ndjson", "parquet"] = Query("csv", alias="format"),
+):
+    # COPY streams over psycopg2 in either DB mode; a ProductSearch body
+    # filters the export, limit and cursor aside
+    search_query = export_search(search_query, vendor)
+    logger.info(f"Exporting {export_format}: {search_query.dict(exclude_none=True)}")
+    try:
+        chunks = export_stream(search_query, export_format)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error starting export: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Database error occurred while exporting products"
+        )
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="torque_rods.{export_format}"'},
+    )
+
+@app.get("/api/products/search/cache")
+def search_cache_stats():
+    return {"catalog_version": catalog_version(), "in_flight": len(search_flights), **search_cache.stats()}
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting FastAPI application")
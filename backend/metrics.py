@@ -0,0 +1,123 @@
+import logging
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from sqlalchemy import text
+
+from search_filters import search_predicates
+
+# Searches whose DB time exceeds this are counted as slow and EXPLAIN ANALYZEd
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_SECONDS', '0.5'))
+# Set to false to count slow queries without re-running them under EXPLAIN ANALYZE
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+
+# Request parameters that page or count results rather than filter them
+PAGING_FIELDS = {'limit', 'cursor', 'count'}
+
+slow_query_log = logging.getLogger('slow_queries')
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Request latency by route',
+    ['method', 'route', 'status'],
+)
+SEARCH_DB_SECONDS = Histogram(
+    'search_db_duration_seconds', 'Time spent in the database (or catalog store) per search',
+    ['backend'],
+)
+SEARCH_SERIALIZE_SECONDS = Histogram(
+    'search_serialize_duration_seconds', 'Time spent rendering a search response to JSON',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+SEARCH_ROWS = Histogram(
+    'search_rows_returned', 'Products returned per search page',
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+SEARCH_FIELD_USAGE = Counter(
+    'search_field_usage_total', 'Searches filtering on each ProductSearch field', ['field'],
+)
+SEARCH_QUERIES = Counter(
+    'search_queries_total', 'Searches by predicate shape and backend', ['shape', 'backend'],
+)
+SEARCH_COALESCED = Counter(
+    'search_coalesced_total', 'Searches answered by an identical search already running in the database',
+)
+SEARCH_DISCONNECTS = Counter(
+    'search_client_disconnects_total', 'Searches whose client disconnected before the database answered',
+)
+SEARCH_CANCELLED = Counter(
+    'search_cancelled_total', 'Database searches cancelled because every client waiting on them disconnected',
+)
+SKU_LOOKUPS = Counter(
+    'sku_lookups_total', 'SKUs resolved by batch lookup, by whether a product matched', ['status'],
+)
+SEARCH_SLOW_QUERIES = Counter(
+    'search_slow_queries_total', f'Searches over {SLOW_QUERY_SECONDS}s of DB time by predicate shape',
+    ['shape'],
+)
+
+
+def route_label(request):
+    """The matched route template, so /api/products/{sku}/... is one series."""
+    route = request.scope.get('route')
+    return getattr(route, 'path', 'unmatched')
+
+
+def predicate_shape(search_query):
+    """Fields and match kinds of a search, e.g. 'c_to_c_num:range,sku:contains'."""
+    shape = sorted(
+        f'{predicate[1]}:{predicate[2] if predicate[0] == "text" else "range"}'
+        for predicate in search_predicates(search_query)
+    )
+    return ','.join(shape) or 'none'
+
+
+def record_search(search_query, backend, seconds, rows):
+    """Count one answered search; returns True when it was slow."""
+    shape = predicate_shape(search_query)
+    for field in search_query.model_dump(exclude_none=True):
+        if field not in PAGING_FIELDS:
+            SEARCH_FIELD_USAGE.labels(field).inc()
+    SEARCH_QUERIES.labels(shape, backend).inc()
+    SEARCH_DB_SECONDS.labels(backend).observe(seconds)
+    SEARCH_ROWS.observe(rows)
+
+    slow = backend == 'postgres' and seconds >= SLOW_QUERY_SECONDS
+    if slow:
+        SEARCH_SLOW_QUERIES.labels(shape).inc()
+    return slow
+
+
+def explain_statement(query):
+    return text(f"EXPLAIN (ANALYZE, BUFFERS) {query.text}")
+
+
+def log_slow_query(search_query, seconds, params, plan_rows):
+    plan = '\n'.join(row[0] for row in plan_rows) if plan_rows else '(not captured)'
+    slow_query_log.warning(
+        f"Slow search ({seconds:.3f}s) shape={predicate_shape(search_query)} "
+        f"params={params}\n{plan}"
+    )
+
+
+def explain_slow_query(db, search_query, seconds, query, params):
+    plan_rows = None
+    if SLOW_QUERY_EXPLAIN:
+        try:
+            plan_rows = db.execute(explain_statement(query), params).all()
+        except Exception as e:
+            slow_query_log.error(f"EXPLAIN ANALYZE failed: {str(e)}")
+    log_slow_query(search_query, seconds, params, plan_rows)
+
+
+async def explain_slow_query_async(db, search_query, seconds, query, params):
+    plan_rows = None
+    if SLOW_QUERY_EXPLAIN:
+        try:
+            plan_rows = (await db.execute(explain_statement(query), params)).all()
+        except Exception as e:
+            slow_query_log.error(f"EXPLAIN ANALYZE failed: {str(e)}")
+    log_slow_query(search_query, seconds, params, plan_rows)
+
+
+def render_metrics():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,158 @@
+from sqlalchemy import text
+from database import (
+    CatalogState, InterchangeGroup, Product, ScrapeQuarantine, ScrapeRun, ScrapeSnapshotRow, engine,
+)
+from interchange import refresh_interchange
+from product_fields import CONTENT_FIELDS, MEASUREMENT_FIELDS, content_hash, fit_key, parse_measurement
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def create_search_indexes(engine):
+    """Create the pg_trgm extension and every index declared on torque_rods."""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+    for index in Product.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+        print(f"Index ready: {index.name}")
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE torque_rods"))
+
+
+def backfill_columns(engine, fields, compute):
+    """Stream (id, *fields) over torque_rods and write back compute(row) in batches."""
+    probe = {name: None for name in fields}
+    assignments = ', '.join(f"{column} = :{column}" for column in compute(probe))
+    update = text(f"UPDATE torque_rods SET {assignments} WHERE id = :id")
+
+    with engine.connect() as reader, engine.begin() as writer:
+        result = reader.execution_options(stream_results=True).execute(
+            text(f"SELECT id, {', '.join(fields)} FROM torque_rods")
+        )
+        updated = 0
+        for rows in result.partitions(BACKFILL_BATCH_SIZE):
+            writer.execute(update, [
+                {'id': row.id, **compute(row._mapping)} for row in rows
+            ])
+            updated += len(rows)
+    return updated
+
+
+def add_measurement_columns(engine):
+    """Add the numeric shadow columns and backfill them from the text fields."""
+    with engine.begin() as conn:
+        for column in MEASUREMENT_FIELDS.values():
+            conn.execute(text(
+                f"ALTER TABLE torque_rods ADD COLUMN IF NOT EXISTS {column} double precision"
+            ))
+
+    updated = backfill_columns(engine, list(MEASUREMENT_FIELDS), lambda row: {
+        column: parse_measurement(row[field]) for field, column in MEASUREMENT_FIELDS.items()
+    })
+    print(f"Backfilled measurements for {updated} products")
+
+
+def add_vendor_sku_unique(engine):
+    """Hash row contents, drop duplicate (vendor, sku) rows and enforce uniqueness.
+
+    NULLs count as equal (NULLS NOT DISTINCT, Postgres 15+), so reruns upsert
+    rows without a vendor rather than appending them; a constraint created
+    without it is replaced.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE torque_rods ADD COLUMN IF NOT EXISTS content_hash varchar(32)"
+        ))
+
+    updated = backfill_columns(engine, CONTENT_FIELDS, lambda row: {
+        'content_hash': content_hash(row),
+    })
+    print(f"Backfilled content hashes for {updated} products")
+
+    with engine.begin() as conn:
+        # Loads store a blank vendor as NULL; bring older rows in line
+        conn.execute(text("UPDATE torque_rods SET vendor = NULL WHERE btrim(vendor) = ''"))
+        # Keep the oldest row of each duplicated (vendor, sku)
+        deleted = conn.execute(text("""
+            DELETE FROM torque_rods t
+            USING torque_rods d
+            WHERE t.vendor IS NOT DISTINCT FROM d.vendor
+              AND t.sku IS NOT DISTINCT FROM d.sku AND t.id > d.id
+        """)).rowcount
+        print(f"Removed {deleted} duplicate products")
+
+        nulls_not_distinct = conn.execute(text("""
+            SELECT i.indnullsnotdistinct FROM pg_constraint c
+            JOIN pg_index i ON i.indexrelid = c.conindid
+            WHERE c.conname = 'uq_torque_rods_vendor_sku'
+        """)).scalar()
+        if nulls_not_distinct is False:
+            conn.execute(text("ALTER TABLE torque_rods DROP CONSTRAINT uq_torque_rods_vendor_sku"))
+        if not nulls_not_distinct:
+            conn.execute(text(
+                "ALTER TABLE torque_rods "
+                "ADD CONSTRAINT uq_torque_rods_vendor_sku UNIQUE NULLS NOT DISTINCT (vendor, sku)"
+            ))
+
+
+def create_catalog_state(engine):
+    """Create the catalog_state table that holds the catalog version."""
+    CatalogState.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO catalog_state (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING"
+        ))
+
+
+def add_fit_keys(engine):
+    """Add the fit_key column to torque_rods and backfill it.
+
+    Runs before create_search_indexes, which builds ix_torque_rods_fit_key.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE torque_rods ADD COLUMN IF NOT EXISTS fit_key varchar(32)"
+        ))
+
+    updated = backfill_columns(engine, CONTENT_FIELDS, lambda row: {
+        'fit_key': fit_key(row),
+    })
+    print(f"Backfilled fit keys for {updated} products")
+
+
+def add_interchange(engine):
+    """Materialize every interchange group from the fit keys."""
+    InterchangeGroup.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        written, _ = refresh_interchange(conn)
+    print(f"Materialized {written} interchange groups")
+
+
+def create_scrape_snapshots(engine):
+    """Create the scrape run, snapshot and quarantine tables."""
+    for model in (ScrapeRun, ScrapeSnapshotRow, ScrapeQuarantine):
+        model.__table__.create(bind=engine, checkfirst=True)
+
+
+# Applied in order; every step must be safe to re-run
+MIGRATIONS = [
+    add_measurement_columns,
+    add_fit_keys,
+    create_search_indexes,
+    create_catalog_state,
+    add_vendor_sku_unique,
+    add_interchange,
+    create_scrape_snapshots,
+]
+
+
+def run_migrations(engine=engine):
+    for migration in MIGRATIONS:
+        print(f"Running migration: {migration.__name__}")
+        migration(engine)
+
+
+if __name__ == '__main__':
+    run_migrations()
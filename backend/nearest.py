@@ -0,0 +1,165 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import text
+
+from product_fields import MEASUREMENT_FIELDS, parse_measurement
+from search_filters import RESULT_COLUMNS
+
+DEFAULT_NEAREST_K = 10
+MAX_NEAREST_K = 100
+
+# Distance contributed by one unit of each measurement: an inch of c_to_c
+# weighs like a quarter inch of shaft diameter or ten degrees of angle
+NEAREST_WEIGHTS = {
+    'c_to_c_num': 1.0,
+    'shaft_dia_num': 4.0,
+    'side_a_angle_num': 0.1,
+    'side_b_angle_num': 0.1,
+}
+
+# Distance radii the Postgres fallback tries in turn on its window column,
+# stopping once the k-th result lies inside the radius. Every pass is
+# windowed, so none scans the whole table: rows further than the last radius
+# on the window column (32" of c_to_c, 8" of shaft, 320 degrees of angle)
+# are never ranked, and a query with nothing that close gets fewer than k
+NEAREST_SQL_RADII = [0.5, 2.0, 8.0, 32.0]
+# Columns that bound the fallback's window, in order of preference, each
+# with a btree index; every target has at least one. Angles are windowed on
+# the orientation's own target, so they work either way round too
+WINDOW_COLUMNS = ['c_to_c_num', 'shaft_dia_num', 'side_a_angle_num', 'side_b_angle_num']
+
+NEAREST_COLUMNS = RESULT_COLUMNS + ['distance', 'flipped']
+
+
+class NearestSearch(BaseModel):
+    # Measured dimensions, in the same formats the catalog uses
+    c_to_c: Optional[str] = None
+    side_a_angle: Optional[str] = None
+    side_b_angle: Optional[str] = None
+    shaft_dia: Optional[str] = None
+    # Filters; sides and vendor must be equal, bushings contain the value
+    side_a: Optional[str] = None
+    side_b: Optional[str] = None
+    side_a_bushing: Optional[str] = None
+    side_b_bushing: Optional[str] = None
+    vendor: Optional[str] = None
+    k: int = Field(DEFAULT_NEAREST_K, ge=1, le=MAX_NEAREST_K)
+
+
+def nearest_target(nearest_query):
+    """Parse the measured dimensions into {numeric column: value}.
+
+    Raises ValueError when a measurement cannot be parsed or none is given.
+    """
+    target = {}
+    for field, column in MEASUREMENT_FIELDS.items():
+        value = getattr(nearest_query, field)
+        if not value:
+            continue
+        number = parse_measurement(value)
+        if number is None:
+            raise ValueError(f"Could not read a measurement from {field}={value!r}")
+        target[column] = number
+    if not target:
+        raise ValueError("Give at least one of c_to_c, side_a_angle, side_b_angle, shaft_dia")
+    return target
+
+
+def _end_checks(nearest_query, query_end, row_end):
+    checks = []
+    side = getattr(nearest_query, f'side_{query_end}')
+    bushing = getattr(nearest_query, f'side_{query_end}_bushing')
+    if side:
+        checks.append((f'side_{row_end}', 'equals', side.lower()))
+    if bushing:
+        checks.append((f'side_{row_end}_bushing', 'contains', bushing.lower()))
+    return checks
+
+
+def orientations(nearest_query):
+    """The ways a row can fit the query: [(flipped, target, checks)].
+
+    A rod fits mounted either way round, so besides matching side a to side
+    a, rows are matched with their ends swapped: the query's side a against
+    the row's side b, with the angles exchanged. checks are (field, match,
+    lowercase value) filters with match "equals" or "contains".
+    """
+    target = nearest_target(nearest_query)
+    vendor = [('vendor', 'equals', nearest_query.vendor.lower())] if nearest_query.vendor else []
+
+    same = (target, _end_checks(nearest_query, 'a', 'a') + _end_checks(nearest_query, 'b', 'b') + vendor)
+    swapped_target = dict(target)
+    for column, other in (('side_a_angle_num', 'side_b_angle_num'), ('side_b_angle_num', 'side_a_angle_num')):
+        swapped_target.pop(column, None)
+        if other in target:
+            swapped_target[column] = target[other]
+    flipped = (swapped_target, _end_checks(nearest_query, 'a', 'b') + _end_checks(nearest_query, 'b', 'a') + vendor)
+
+    # A symmetric query reads the same both ways round
+    if flipped[0] == same[0] and sorted(flipped[1]) == sorted(same[1]):
+        return [(False, *same)]
+    return [(False, *same), (True, *flipped)]
+
+
+def build_nearest_query(nearest_query, radius=None):
+    """Top-k rows by weighted distance in either orientation, and the parameters.
+
+    With a radius, rows are first narrowed to those within it on the window
+    column, which the btree index on that column serves.
+    """
+    params = {'k': nearest_query.k}
+    selects = []
+    for i, (flipped, target, checks) in enumerate(orientations(nearest_query)):
+        conditions = []
+        terms = []
+        for column, value in target.items():
+            conditions.append(f"{column} IS NOT NULL")
+            terms.append(f"power(({column} - :{column}_{i}) * {NEAREST_WEIGHTS[column]}, 2)")
+            params[f'{column}_{i}'] = value
+        for field, match, needle in checks:
+            if match == 'contains':
+                conditions.append(f"{field} ILIKE :{field}_{i}")
+                params[f'{field}_{i}'] = f'%{needle}%'
+            else:
+                conditions.append(f"lower({field}) = :{field}_{i}")
+                params[f'{field}_{i}'] = needle
+
+        window = next((column for column in WINDOW_COLUMNS if column in target), None)
+        if radius is not None and window is not None:
+            width = radius / NEAREST_WEIGHTS[window]
+            conditions.append(f"{window} BETWEEN :window_low_{i} AND :window_high_{i}")
+            params[f'window_low_{i}'] = target[window] - width
+            params[f'window_high_{i}'] = target[window] + width
+
+        selects.append(f"""
+            SELECT {', '.join(RESULT_COLUMNS)}, sqrt({' + '.join(terms)}) AS distance, {flipped} AS flipped
+            FROM torque_rods
+            WHERE {' AND '.join(conditions)}
+        """)
+
+    # A row fitting both ways round keeps its closer orientation, unflipped on a tie
+    query = text(f"""
+        SELECT * FROM (
+            SELECT DISTINCT ON (id) * FROM ({' UNION ALL '.join(selects)}) candidates
+            ORDER BY id, distance, flipped
+        ) best
+        ORDER BY distance, id
+        LIMIT :k
+    """)
+    return query, params
+
+
+def nearest_radii(nearest_query):
+    """The radii to try with build_nearest_query, widest last."""
+    return NEAREST_SQL_RADII
+
+
+def nearest_settled(nearest_query, rows, radius):
+    """Whether `rows` are the true top-k: no row outside the radius could rank among them."""
+    return radius is None or (len(rows) == nearest_query.k and rows[-1].distance <= radius)
+
+
+def nearest_response(rows):
+    """The response body for rows of NEAREST_COLUMNS values, closest first."""
+    return {"products": [dict(zip(NEAREST_COLUMNS, row)) for row in rows]}
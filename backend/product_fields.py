@@ -0,0 +1,136 @@
+import hashlib
+import re
+
+# Source fields that make up a product's content, hashed to skip no-op updates
+CONTENT_FIELDS = [
+    'sku', 'type1', 'type2', 'c_to_c', 'side_a', 'side_b',
+    'side_a_bushing', 'side_b_bushing', 'side_a_angle', 'side_b_angle',
+    'shaft_dia', 'notes', 'vendor',
+]
+
+# Text measurement fields and the numeric shadow column parsed from each
+MEASUREMENT_FIELDS = {
+    'c_to_c': 'c_to_c_num',
+    'side_a_angle': 'side_a_angle_num',
+    'side_b_angle': 'side_b_angle_num',
+    'shaft_dia': 'shaft_dia_num',
+}
+
+# Fields that decide whether two parts fit the same application. Every
+# vendor lists c_to_c and the two sides, which make up the fit key; the
+# bushing, angle and shaft fields are only compared where both parts list them.
+FIT_FIELDS = [
+    'c_to_c', 'side_a', 'side_b', 'side_a_bushing', 'side_b_bushing',
+    'side_a_angle', 'side_b_angle', 'shaft_dia',
+]
+
+# Mixed fractions ("14 3/16", "1-1/4"), plain fractions ("3/4") or decimals ("14.31")
+_MEASUREMENT = re.compile(r'(?:(\d+)[\s-]+)?(\d+)/(\d+)|(\d*\.?\d+)')
+# Unit marks that may trail a measurement: inches, feet, degrees
+_UNITS = re.compile(r'["\'°\s]|in\b|deg\b')
+
+
+def parse_measurement(value, strict=False):
+    """Parse a measurement such as `14 3/16"'` or `14.31` into a float.
+
+    Returns None when no number is found, or with strict=True when anything
+    other than the number and its units is present.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    match = _MEASUREMENT.search(value)
+    if not match:
+        return None
+    if strict and _UNITS.sub('', value[:match.start()] + value[match.end():]):
+        return None
+
+    whole, numerator, denominator, decimal = match.groups()
+    if decimal is not None:
+        return float(decimal)
+    if int(denominator) == 0:
+        return None
+    return int(whole or 0) + int(numerator) / int(denominator)
+
+
+def fill_measurements(row):
+    """Set the numeric shadow columns of a row dict from its text fields."""
+    for field, column in MEASUREMENT_FIELDS.items():
+        row[column] = parse_measurement(row.get(field))
+    return row
+
+
+def _fit_text(value):
+    return ' '.join(str(value or '').lower().split())
+
+
+def _fit_measurement(value):
+    number = parse_measurement(value, strict=True)
+    return _fit_text(value) if number is None else f'{number:.3f}'
+
+
+def fit_key(row):
+    """md5 of a row dict's c_to_c and sides; rows that interchange share a key.
+
+    c_to_c is compared as a number (so `14 1/4"` matches `14.25`), the sides
+    case- and whitespace-insensitively and in sorted order, so a rod listed
+    Taper/Straddle matches one listed Straddle/Taper. Rows with equal keys
+    are candidates; fits() settles the fields only some vendors list.
+    Returns None when c_to_c can't be parsed, since such rows can't be matched.
+    """
+    c_to_c = parse_measurement(row.get('c_to_c'))
+    if c_to_c is None:
+        return None
+    sides = sorted(_fit_text(row.get(f'side_{end}')) for end in 'ab')
+    parts = [f'{c_to_c:.3f}', *sides]
+    return hashlib.md5('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _fit_ends(row):
+    return [
+        (
+            _fit_text(row.get(f'side_{end}')),
+            _fit_text(row.get(f'side_{end}_bushing')),
+            _fit_measurement(row.get(f'side_{end}_angle')),
+        )
+        for end in 'ab'
+    ]
+
+
+def _agrees(first, second):
+    # A field left blank by either listing matches anything
+    return not first or not second or first == second
+
+
+def fits(row, other):
+    """Whether two row dicts with the same fit key describe interchangeable parts.
+
+    Bushings, angles and shaft diameter must agree wherever both rows list
+    them; a blank value matches anything. The ends are paired by side, in
+    either order when both sides are the same.
+    """
+    if not _agrees(_fit_measurement(row.get('shaft_dia')), _fit_measurement(other.get('shaft_dia'))):
+        return False
+    ends = _fit_ends(row)
+    other_ends = _fit_ends(other)
+    return any(
+        all(
+            end[0] == other_end[0] and _agrees(end[1], other_end[1]) and _agrees(end[2], other_end[2])
+            for end, other_end in zip(ends, pairing)
+        )
+        for pairing in (other_ends, other_ends[::-1])
+    )
+
+
+def content_hash(row):
+    """md5 over the content fields of a row dict; None and '' hash the same."""
+    payload = '\x1f'.join(str(row.get(field) or '') for field in CONTENT_FIELDS)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def fill_derived(row):
+    """Set every column derived from a row dict's source fields."""
+    fill_measurements(row)
+    row['content_hash'] = content_hash(row)
+    row['fit_key'] = fit_key(row)
+    return row
@@ -0,0 +1,83 @@
+"""orjson encoding and gzip/brotli negotiation for search responses.
+
+A search page is encoded once into an EncodedPage, which is also what the
+search cache holds: a cache hit sends stored bytes without re-encoding, and
+each compressed variant of a page is built at most once.
+"""
+import gzip
+import os
+
+import brotli
+import orjson
+from fastapi.responses import Response
+
+# Bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+
+# Supported content codings, preferred first when the client weights them equally
+ENCODINGS = ['br', 'gzip']
+
+_COMPRESSORS = {
+    'br': lambda body: brotli.compress(body, quality=BROTLI_QUALITY),
+    'gzip': lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+}
+
+
+class EncodedPage:
+    """A search response body as JSON bytes, with its compressed variants."""
+
+    __slots__ = ('body', 'rows', '_compressed')
+
+    def __init__(self, body, rows):
+        self.body = body
+        self.rows = rows
+        self._compressed = {}
+
+    def compressed(self, encoding):
+        # Racing threads may both compress; they store identical bytes
+        body = self._compressed.get(encoding)
+        if body is None:
+            body = self._compressed[encoding] = _COMPRESSORS[encoding](self.body)
+        return body
+
+
+def encode_page(response, rows=None):
+    """Encode a response body with orjson; `rows` defaults to its product count."""
+    return EncodedPage(orjson.dumps(response), len(response['products']) if rows is None else rows)
+
+
+# The answer to a search that sets no field: an empty page, whatever the backend
+EMPTY_SEARCH = encode_page({"products": [], "next_cursor": None})
+
+
+def negotiate_encoding(accept_encoding):
+    """The best of ENCODINGS an Accept-Encoding header allows, or None for identity."""
+    weights = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    fallback = weights.get('*', 0.0)
+    best = max(ENCODINGS, key=lambda encoding: weights.get(encoding, fallback))
+    return best if weights.get(best, fallback) > 0 else None
+
+
+def page_http_response(page, accept_encoding=None):
+    """A JSON Response for `page`, compressed when it is large enough and the client accepts it."""
+    body = page.body
+    headers = {'Vary': 'Accept-Encoding'}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= COMPRESSION_MIN_BYTES else None
+    if encoding is not None:
+        body = page.compressed(encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -0,0 +1,169 @@
+"""Snapshot scraper runs and apply only what changed since the previous run.
+
+Every run's rows are written to scrape_snapshot_rows and compared by
+content hash with the last applied run of the same vendor and scope (the
+categories it covered). Only added and changed rows are upserted and only
+vanished rows are deleted; the change report names each one, with the
+attributes that changed. Rows the scraper could not read go to
+scrape_quarantine and keep their previous version in the snapshot.
+"""
+import json
+
+from sqlalchemy import insert, text
+
+from bulk_loader import bulk_load, format_report
+from database import ScrapeQuarantine, ScrapeSnapshotRow, engine as default_engine
+from product_fields import CONTENT_FIELDS, content_hash
+
+SNAPSHOT_BATCH_SIZE = 1000
+# Runs kept per (vendor, scope), plus the latest applied one; older snapshots
+# and quarantined rows are pruned
+SNAPSHOT_RETENTION = 10
+
+
+def quarantine_entry(error, record=None, row_index=None):
+    """A quarantined row: what was read of it and why it was rejected."""
+    record = record or {}
+    return {'sku': record.get('sku') or None, 'row_index': row_index, 'error': str(error), 'data': record}
+
+
+def snapshot_rows(records, vendor):
+    """Key records by SKU (the last copy wins), keeping only content fields."""
+    rows = {}
+    for record in records:
+        data = {field: record.get(field) for field in CONTENT_FIELDS}
+        data['vendor'] = vendor
+        rows[data['sku']] = data
+    return rows
+
+
+def diff_snapshots(previous, current):
+    """Compare {sku: data} snapshots by content hash.
+
+    Returns (added, removed, changed): sorted SKU lists for the first two,
+    and {sku: {field: [old, new]}} for rows whose content changed.
+    """
+    added = sorted(set(current) - set(previous))
+    removed = sorted(set(previous) - set(current))
+    changed = {}
+    for sku in sorted(set(current) & set(previous)):
+        old, new = previous[sku], current[sku]
+        if content_hash(old) == content_hash(new):
+            continue
+        changed[sku] = {
+            field: [old.get(field), new.get(field)]
+            for field in CONTENT_FIELDS
+            if (old.get(field) or '') != (new.get(field) or '')
+        }
+    return added, removed, changed
+
+
+def _insert_batches(conn, table, rows):
+    for start in range(0, len(rows), SNAPSHOT_BATCH_SIZE):
+        conn.execute(insert(table), rows[start:start + SNAPSHOT_BATCH_SIZE])
+
+
+def record_run(records, vendor, scope, quarantined=(), engine=default_engine, apply=True):
+    """Snapshot one scraper run, diff it against the previous one and apply the diff.
+
+    `scope` names what the run covered (e.g. its sorted categories), so a
+    partial run never deletes rows it did not look at. An empty run is
+    rejected rather than applied as a delete of everything. Returns the
+    change report, which is also stored on the scrape_runs row.
+    """
+    quarantined = list(quarantined)
+    quarantined += [quarantine_entry('Row has no SKU', record) for record in records if not record.get('sku')]
+    current = snapshot_rows([record for record in records if record.get('sku')], vendor)
+
+    with engine.begin() as conn:
+        run_id = conn.execute(text("""
+            INSERT INTO scrape_runs (vendor, scope, status, started_at)
+            VALUES (:vendor, :scope, 'snapshotted', now())
+            RETURNING id
+        """), {'vendor': vendor, 'scope': scope}).scalar()
+        previous_id = conn.execute(text("""
+            SELECT id FROM scrape_runs
+            WHERE vendor = :vendor AND scope = :scope AND status = 'applied'
+            ORDER BY id DESC LIMIT 1
+        """), {'vendor': vendor, 'scope': scope}).scalar()
+
+        previous = {}
+        if previous_id is not None:
+            previous = dict(conn.execute(
+                text("SELECT sku, data FROM scrape_snapshot_rows WHERE run_id = :run_id"),
+                {'run_id': previous_id},
+            ).all())
+
+        # A row that failed to scrape keeps its last good version instead of reading as removed
+        for entry in quarantined:
+            sku = entry.get('sku')
+            if sku and sku not in current and sku in previous:
+                current[sku] = previous[sku]
+
+        _insert_batches(conn, ScrapeSnapshotRow.__table__, [
+            {'run_id': run_id, 'sku': sku, 'content_hash': content_hash(data), 'data': data}
+            for sku, data in current.items()
+        ])
+        _insert_batches(conn, ScrapeQuarantine.__table__, [
+            {'run_id': run_id, 'sku': entry.get('sku'), 'error': entry['error'], 'data': entry.get('data')}
+            for entry in quarantined
+        ])
+
+    added, removed, changed = diff_snapshots(previous, current)
+    report = {
+        'run_id': run_id,
+        'previous_run_id': previous_id,
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        'quarantined': len(quarantined),
+    }
+
+    status = 'snapshotted'
+    if not current and previous:
+        status = 'rejected'
+        report['error'] = 'Run produced no rows; not deleting the previous snapshot'
+    elif apply:
+        report['load'] = bulk_load(
+            [current[sku] for sku in added + list(changed)],
+            engine=engine,
+            delete=[(vendor, sku) for sku in removed],
+        )
+        status = 'applied'
+    report['status'] = status
+
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE scrape_runs SET status = :status, report = CAST(:report AS jsonb) WHERE id = :id"),
+            {'status': status, 'report': json.dumps(report), 'id': run_id},
+        )
+        # The latest applied run is the next diff's baseline, however old
+        conn.execute(text("""
+            DELETE FROM scrape_runs
+            WHERE vendor = :vendor AND scope = :scope AND id NOT IN (
+                SELECT id FROM scrape_runs WHERE vendor = :vendor AND scope = :scope
+                ORDER BY id DESC LIMIT :keep
+            ) AND id IS DISTINCT FROM (
+                SELECT max(id) FROM scrape_runs
+                WHERE vendor = :vendor AND scope = :scope AND status = 'applied'
+            )
+        """), {'vendor': vendor, 'scope': scope, 'keep': SNAPSHOT_RETENTION})
+    return report
+
+
+def format_change_report(report):
+    lines = [
+        f"Run {report['run_id']} ({report['status']}): {len(report['added'])} added, "
+        f"{len(report['removed'])} removed, {len(report['changed'])} changed, "
+        f"{report['quarantined']} quarantined"
+    ]
+    if report.get('error'):
+        lines.append(report['error'])
+    lines += [f"  + {sku}" for sku in report['added']]
+    lines += [f"  - {sku}" for sku in report['removed']]
+    for sku, fields in report['changed'].items():
+        changes = ', '.join(f"{field}: {old!r} -> {new!r}" for field, (old, new) in fields.items())
+        lines.append(f"  ~ {sku}: {changes}")
+    if 'load' in report:
+        lines.append(format_report(report['load']))
+    return '\n'.join(lines)
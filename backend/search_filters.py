@@ -0,0 +1,230 @@
+import json
+import re
+from itertools import islice
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+from sqlalchemy import text
+from product_fields import MEASUREMENT_FIELDS, parse_measurement
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Columns returned by a search; the numeric shadow columns stay server-side
+RESULT_COLUMNS = [
+    'id', 'sku', 'type1', 'type2', 'c_to_c', 'side_a', 'side_b',
+    'side_a_bushing', 'side_b_bushing', 'side_a_angle', 'side_b_angle',
+    'shaft_dia', 'notes', 'vendor',
+]
+
+
+class ProductSearch(BaseModel):
+    sku: Optional[str] = None
+    type1: Optional[str] = None
+    type2: Optional[str] = None
+    c_to_c: Optional[str] = None
+    side_a: Optional[str] = None
+    side_b: Optional[str] = None
+    side_a_bushing: Optional[str] = None
+    side_b_bushing: Optional[str] = None
+    side_a_angle: Optional[str] = None
+    side_b_angle: Optional[str] = None
+    shaft_dia: Optional[str] = None
+    notes: Optional[str] = None
+    vendor: Optional[str] = None
+    # Numeric filters on the measurement fields. `_tol` widens a numeric
+    # value given in the text field to value +/- tol.
+    c_to_c_min: Optional[float] = None
+    c_to_c_max: Optional[float] = None
+    c_to_c_tol: Optional[float] = None
+    side_a_angle_min: Optional[float] = None
+    side_a_angle_max: Optional[float] = None
+    side_a_angle_tol: Optional[float] = None
+    side_b_angle_min: Optional[float] = None
+    side_b_angle_max: Optional[float] = None
+    side_b_angle_tol: Optional[float] = None
+    shaft_dia_min: Optional[float] = None
+    shaft_dia_max: Optional[float] = None
+    shaft_dia_tol: Optional[float] = None
+    # Keyset pagination: pass the previous page's next_cursor to continue
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    cursor: Optional[int] = None
+    count: Optional[Literal['exact', 'approximate']] = None
+
+
+# How each search field is matched. "contains" is served by the pg_trgm GIN
+# indexes, "equals" and "prefix" by the lower() btree indexes on torque_rods.
+FIELD_MATCHES = [
+    ('sku', 'contains'),
+    ('type1', 'equals'),
+    ('type2', 'contains'),
+    ('c_to_c', 'prefix'),
+    ('side_a', 'equals'),
+    ('side_b', 'equals'),
+    ('side_a_bushing', 'contains'),
+    ('side_b_bushing', 'contains'),
+    ('side_a_angle', 'contains'),
+    ('side_b_angle', 'contains'),
+    ('shaft_dia', 'contains'),
+    ('vendor', 'equals'),
+]
+
+# Slack for comparing parsed measurements that should be equal
+EPSILON = 1e-6
+
+_DECIMAL = re.compile(r'\s*\d+(?:\.(\d*))?\s*')
+
+
+def _measurement_predicates(search_query, field, match):
+    """Range predicates for a measurement field, or a text predicate if the value isn't numeric."""
+    column = MEASUREMENT_FIELDS[field]
+    value = getattr(search_query, field)
+    tolerance = getattr(search_query, f'{field}_tol')
+    low = getattr(search_query, f'{field}_min')
+    high = getattr(search_query, f'{field}_max')
+    predicates = []
+
+    if value:
+        number = parse_measurement(value, strict=True)
+        decimal = _DECIMAL.fullmatch(value)
+        if number is None:
+            predicates.append(('text', field, match, value.lower()))
+        elif tolerance is not None:
+            predicates.append(('range', column, number - tolerance, number + tolerance))
+        elif match == 'prefix' and decimal:
+            # A partially typed length: "15" covers [15, 16), "15.5" covers [15.5, 15.6)
+            step = 10 ** -len(decimal.group(1) or '')
+            predicates.append(('range', column, number, number + step - EPSILON))
+        else:
+            predicates.append(('range', column, number - EPSILON, number + EPSILON))
+
+    if low is not None or high is not None:
+        predicates.append(('range', column, low, high))
+    return predicates
+
+
+def search_predicates(search_query):
+    """Normalize a ProductSearch into a tuple of predicates.
+
+    Text predicates are ('text', field, match, lowercase value); numeric ones
+    are ('range', column, low, high) with inclusive bounds, None meaning open.
+    """
+    predicates = []
+    for field, match in FIELD_MATCHES:
+        if field in MEASUREMENT_FIELDS:
+            predicates.extend(_measurement_predicates(search_query, field, match))
+            continue
+        value = getattr(search_query, field)
+        if value:
+            predicates.append(('text', field, match, value.lower()))
+    return tuple(predicates)
+
+
+def build_conditions(predicates):
+    """Build the WHERE conditions and bind parameters for search predicates."""
+    conditions = []
+    params = {}
+
+    for i, predicate in enumerate(predicates):
+        if predicate[0] == 'range':
+            _, column, low, high = predicate
+            if low is not None:
+                conditions.append(f"{column} >= :{column}_low_{i}")
+                params[f'{column}_low_{i}'] = low
+            if high is not None:
+                conditions.append(f"{column} <= :{column}_high_{i}")
+                params[f'{column}_high_{i}'] = high
+            continue
+
+        _, field, match, value = predicate
+        if match == 'contains':
+            conditions.append(f"{field} ILIKE :{field}")
+            params[field] = f'%{value}%'
+        elif match == 'prefix':
+            conditions.append(f"lower({field}) LIKE :{field}")
+            params[field] = f'{value}%'
+        else:
+            conditions.append(f"lower({field}) = :{field}")
+            params[field] = value
+
+    return conditions, params
+
+
+def search_key(search_query):
+    """Hashable identity of a search, used to share cached results."""
+    return (
+        search_predicates(search_query),
+        search_query.limit,
+        search_query.cursor,
+        search_query.count,
+    )
+
+
+def build_search_query(search_query):
+    """Return one page of the search and its parameters, or (None, {}) when no field is set.
+
+    Rows come back in id order, one more than `limit` so the caller can tell
+    whether another page follows.
+    """
+    conditions, params = build_conditions(search_predicates(search_query))
+    if not conditions:
+        return None, params
+
+    if search_query.cursor is not None:
+        conditions.append("id > :cursor")
+        params['cursor'] = search_query.cursor
+    params['limit'] = search_query.limit + 1
+
+    # Combine all conditions with AND
+    where_clause = " AND ".join(conditions)
+
+    query = text(f"""
+        SELECT {', '.join(RESULT_COLUMNS)} FROM torque_rods
+        WHERE {where_clause}
+        ORDER BY id
+        LIMIT :limit
+    """)
+    return query, params
+
+
+def build_count_query(search_query):
+    """Count every row the search matches, ignoring the cursor.
+
+    The approximate count is the planner's row estimate from EXPLAIN, which
+    avoids visiting the matching rows at all.
+    """
+    conditions, params = build_conditions(search_predicates(search_query))
+    where_clause = " AND ".join(conditions)
+
+    if search_query.count == 'approximate':
+        query = text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM torque_rods WHERE {where_clause}")
+    else:
+        query = text(f"SELECT count(*) FROM torque_rods WHERE {where_clause}")
+    return query, params
+
+
+def read_count(search_query, value):
+    """Turn the scalar returned by build_count_query into a row count."""
+    if search_query.count == 'approximate':
+        plan = json.loads(value) if isinstance(value, str) else value
+        return int(plan[0]['Plan']['Plan Rows'])
+    return value
+
+
+def page_response(search_query, rows, total=None, estimate=False):
+    """Build the paginated response body from rows of RESULT_COLUMNS values.
+
+    `rows` is read once, so a live query result works; a row past `limit`
+    is the lookahead row and only decides next_cursor.
+    """
+    rows = iter(rows)
+    products = [dict(zip(RESULT_COLUMNS, values)) for values in islice(rows, search_query.limit)]
+    has_more = next(rows, None) is not None
+    response = {
+        "products": products,
+        "next_cursor": products[-1]['id'] if has_more else None,
+    }
+    if search_query.count:
+        response["total"] = total
+        response["total_is_estimate"] = estimate
+    return response
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+from contextlib import contextmanager
+
+from metrics import SEARCH_CANCELLED, SEARCH_COALESCED, SEARCH_DISCONNECTS
+
+# Set to false to give every request its own execution, run to completion
+SEARCH_SINGLE_FLIGHT = os.getenv('SEARCH_SINGLE_FLIGHT', 'true').lower() in ('1', 'true', 'yes')
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its search was answered."""
+
+
+async def client_disconnected(request):
+    """Return once the client behind `request` has disconnected.
+
+    The body has already been read, so the server's next receive() only
+    completes with http.disconnect: when the client drops the connection,
+    or after the response is sent.
+    """
+    while (await request.receive())['type'] != 'http.disconnect':
+        pass
+
+
+class Flight:
+    """One execution of a search, shared by every request waiting on it."""
+
+    __slots__ = ('key', 'task', 'waiters', 'cancelled', '_cancel_hooks')
+
+    def __init__(self, key):
+        self.key = key
+        self.task = None
+        self.waiters = 0
+        self.cancelled = False
+        self._cancel_hooks = []
+
+    def on_cancel(self, hook):
+        """Call `hook` when the flight is abandoned; at once if it already was.
+
+        For work running off the event loop, which cancelling the task does
+        not interrupt: hooks may be registered from any thread.
+        """
+        self._cancel_hooks.append(hook)
+        if self.cancelled:
+            hook()
+
+    @contextmanager
+    def cancelling(self, cancel):
+        """Call `cancel` if the flight is abandoned while the block runs.
+
+        The hook is disarmed on leaving the block, before whatever `cancel`
+        acts on (a pooled connection, say) is handed to someone else.
+        """
+        lock = threading.Lock()
+        armed = True
+
+        def hook():
+            with lock:
+                if armed:
+                    cancel()
+
+        self.on_cancel(hook)
+        try:
+            yield
+        finally:
+            with lock:
+                armed = False
+
+    def cancel(self):
+        self.cancelled = True
+        for hook in self._cancel_hooks:
+            hook()
+        self.task.cancel()
+
+
+class SingleFlight:
+    """Coalesces identical concurrent searches into one execution.
+
+    The first request for a key starts the work in its own task; requests
+    for the same key arriving before it lands wait on that task instead of
+    starting another. A request whose client disconnects stops waiting, and
+    once no request is left waiting the work is cancelled. A finished
+    flight is forgotten at once: results outlive it only in the search
+    cache.
+    """
+
+    def __init__(self, enabled=SEARCH_SINGLE_FLIGHT):
+        self.enabled = enabled
+        self._flights = {}
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def run(self, key, work, disconnected):
+        """The result of `work(flight)`, shared with concurrent calls for `key`.
+
+        `disconnected()` returns an awaitable that completes when the
+        caller's client goes away; the call then raises ClientDisconnected.
+        """
+        if not self.enabled:
+            return await work(Flight(key))
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = Flight(key)
+            flight.task = asyncio.ensure_future(work(flight))
+            flight.task.add_done_callback(lambda task: self._land(flight))
+        else:
+            SEARCH_COALESCED.inc()
+
+        flight.waiters += 1
+        watcher = asyncio.ensure_future(disconnected())
+        try:
+            # Waiting does not cancel the flight when this request is cancelled
+            await asyncio.wait((flight.task, watcher), return_when=asyncio.FIRST_COMPLETED)
+            if flight.task.done():
+                return flight.task.result()
+            SEARCH_DISCONNECTS.inc()
+            raise ClientDisconnected()
+        finally:
+            watcher.cancel()
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(flight)
+                flight.cancel()
+                SEARCH_CANCELLED.inc()
+
+    def _forget(self, flight):
+        # Identical searches arriving later start afresh instead of joining it
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def _land(self, flight):
+        self._forget(flight)
+        # Nobody is left to read an abandoned flight's error
+        if not flight.task.cancelled():
+            flight.task.exception()
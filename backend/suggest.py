@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Free-text fields the typeahead completes
+SUGGEST_FIELDS = ['sku', 'type2', 'side_a_bushing', 'side_b_bushing']
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+
+class SuggestIndex:
+    """Prefix completions for the free-text search fields.
+
+    Each field keeps its distinct lowercase values sorted, next to a display
+    value and row count for each. A prefix's completions are the run of
+    values starting at its bisection point, so a lookup is a binary search
+    plus at most `limit` string comparisons and never reaches Postgres.
+    """
+
+    def __init__(self):
+        self._fields = None
+        self._reload_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._fields is not None
+
+    def load(self, engine):
+        """Read the distinct values of every field and atomically swap them in."""
+        with self._reload_lock:
+            start = time.perf_counter()
+            fields = {}
+            with engine.connect() as conn:
+                for field in SUGGEST_FIELDS:
+                    rows = conn.execute(text(f"""
+                        SELECT lower({field}) AS key, min({field}) AS value, count(*) AS rows
+                        FROM torque_rods
+                        WHERE {field} <> ''
+                        GROUP BY lower({field})
+                    """)).all()
+                    # Sorted in Python, so the order is the one bisect compares with
+                    rows.sort(key=lambda row: row.key)
+                    fields[field] = (
+                        [row.key for row in rows],
+                        [row.value for row in rows],
+                        array('I', (row.rows for row in rows)),
+                    )
+            self._fields = fields
+            sizes = ', '.join(f"{field}: {len(keys)}" for field, (keys, _, _) in fields.items())
+            logger.info(f"Loaded suggestion values ({sizes}) in {time.perf_counter() - start:.3f}s")
+
+    def suggest(self, field, prefix, limit=DEFAULT_SUGGESTIONS):
+        """Up to `limit` values of `field` starting with `prefix`, alphabetically."""
+        keys, values, counts = self._fields[field]
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        suggestions = []
+        for i in range(start, min(len(keys), start + limit)):
+            if not keys[i].startswith(prefix):
+                break
+            suggestions.append({"value": values[i], "rows": counts[i]})
+        return suggestions
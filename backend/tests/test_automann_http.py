@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import automann_http
+from automann_http import LoginError, scrape
+from fixtures.automann_stub_server import RESPONSES, serve
+
+
+def stub_url(server):
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+@pytest.fixture
+def stub():
+    server = serve(port=0)
+    yield stub_url(server)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def responses():
+    with open(RESPONSES, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def serve_responses(tmp_path):
+    servers = []
+
+    def start(entries):
+        path = tmp_path / 'responses.json'
+        path.write_text(json.dumps(entries), encoding='utf-8')
+        servers.append(serve(port=0, responses=path))
+        return stub_url(servers[-1])
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def credentials(monkeypatch):
+    monkeypatch.setenv('AUTOMANN_USERNAME', 'demo')
+    monkeypatch.setenv('AUTOMANN_PASSWORD', 'demo')
+
+
+def entry(entries, path, query=''):
+    return next(e for e in entries if e['path'] == path and e['query'] == query)
+
+
+def test_scrape_logs_in_and_returns_records(stub):
+    records, quarantined, failed = asyncio.run(scrape(['Cabin'], stub))
+    assert quarantined == []
+    assert failed == []
+    # Tiles 111-113 hold 3, 8 and 7 rows, returned in tile order
+    assert len(records) == 18
+    assert [record['sku'] for record in records[:3]] == ['TR-CB000', 'TR-CB001', 'TR-CB002']
+    assert records[0]['vendor'] == 'Automann'
+    assert records[0]['type1'] == 'Cabin'
+    assert set(records[0]) == {
+        'vendor', 'sku', 'type1', 'type2', 'c_to_c', 'side_a', 'side_b',
+        'side_a_bushing', 'side_b_bushing', 'side_a_angle', 'side_b_angle', 'shaft_dia',
+    }
+
+
+def test_rows_without_sku_are_quarantined(responses, serve_responses):
+    rows = entry(responses, '/wizard/torquerods/grid', 'product=111')['body']['rows']
+    rows[1] = dict(rows[1], sku=None)
+    records, quarantined, failed = asyncio.run(scrape(['Cabin'], serve_responses(responses)))
+    assert failed == []
+    assert len(records) == 17
+    assert 'TR-CB001' not in {record['sku'] for record in records}
+    assert len(quarantined) == 1
+
+
+def test_requests_without_a_session_are_refused(stub):
+    records, _, failed = asyncio.run(scrape(['Cabin', 'Full Ball'], stub, cookies=httpx.Cookies()))
+    assert records == []
+    assert failed == [('Cabin', None), ('Full Ball', None)]
+
+
+def test_a_failed_grid_fails_only_its_tile(responses, serve_responses):
+    entry(responses, '/wizard/torquerods/grid', 'product=112')['status'] = 500
+    records, _, failed = asyncio.run(scrape(['Cabin'], serve_responses(responses)))
+    assert failed == [('Cabin', 112)]
+    # Tiles 111 and 113 still come back
+    assert len(records) == 10
+
+
+def test_queued_tiles_do_not_time_out_waiting_for_a_connection(monkeypatch):
+    # 13 grids behind one connection wait far longer than the request timeout
+    monkeypatch.setattr(automann_http, 'REQUEST_TIMEOUT', 0.35)
+    server = serve(port=0, delay=0.1)
+    try:
+        records, _, failed = asyncio.run(
+            scrape(['With Bushing', 'Full Ball', 'Cabin'], stub_url(server), concurrency=1)
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert failed == []
+    assert len({record['sku'] for record in records}) == len(records) > 0
+
+
+def test_failed_login(responses, serve_responses):
+    # A rejected login redirects back to the form without a session
+    login_post = entry(responses, '/customer/account/loginPost/')
+    login_post['headers'] = {'Location': '/customer/account/login/'}
+    with pytest.raises(LoginError):
+        asyncio.run(scrape(['Cabin'], serve_responses(responses)))
@@ -0,0 +1,82 @@
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import automann_runner
+from automann_runner import Checkpoint, retire_checkpoint, run_scrape
+
+SITE = Path(__file__).resolve().parent.parent / 'fixtures' / 'automann_site'
+
+# Cabin tiles render 3, 8 and 7 rows in the fixture
+CABIN_SKUS = (
+    [f'TR-CB{n:03d}' for n in range(0, 3)]
+    + [f'TR-CB{n:03d}' for n in range(10, 18)]
+    + [f'TR-CB{n:03d}' for n in range(20, 27)]
+)
+
+
+@pytest.fixture(scope='module')
+def site_url():
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(SITE))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module', autouse=True)
+def chrome():
+    try:
+        automann_runner.get_driver().quit()
+    except Exception as e:
+        pytest.skip(f'headless Chrome unavailable: {e}')
+
+
+@pytest.fixture(autouse=True)
+def credentials(monkeypatch):
+    monkeypatch.setenv('AUTOMANN_USERNAME', 'demo')
+    monkeypatch.setenv('AUTOMANN_PASSWORD', 'demo')
+
+
+def test_scrape_fixture_site(site_url, tmp_path):
+    records, quarantined, failed = run_scrape(
+        ['Cabin'], workers=2, checkpoint=tmp_path / 'run.jsonl', base_url=site_url,
+    )
+    assert failed == []
+    assert quarantined == []
+    assert [record['sku'] for record in records] == CABIN_SKUS
+    assert records[0] == {
+        'vendor': 'Automann', 'sku': 'TR-CB000', 'type1': 'Cabin', 'type2': 'Standard',
+        'c_to_c': '14 1/8"', 'side_a': 'Straddle', 'side_b': 'Straddle',
+        'side_a_bushing': 'Rubber', 'side_b_bushing': 'Urethane',
+        'side_a_angle': '0°', 'side_b_angle': '0°', 'shaft_dia': '1 1/4"',
+    }
+
+
+def test_resume_after_crash(site_url, tmp_path, monkeypatch):
+    path = tmp_path / 'run.jsonl'
+    expected, _, _ = run_scrape(['Cabin'], workers=1, checkpoint=path, base_url=site_url)
+
+    # A crash after the first tile, halfway through writing the second
+    lines = path.read_text().splitlines()
+    path.write_text(lines[0] + '\n' + lines[1] + '\n' + lines[2][:20])
+    assert len(Checkpoint(path).done) == 1
+
+    opened = []
+    open_product = automann_runner.open_product
+    monkeypatch.setattr(
+        automann_runner, 'open_product', lambda driver, product: opened.append(product) or open_product(driver, product)
+    )
+    records, quarantined, failed = run_scrape(['Cabin'], workers=1, checkpoint=path, base_url=site_url)
+    assert failed == []
+    assert len(opened) == 2
+    assert records == expected
+
+    done = retire_checkpoint(path)
+    assert not path.exists() and done.name == 'run.done.jsonl'
+    records, _, _ = run_scrape(['Cabin'], workers=1, checkpoint=path, base_url=site_url)
+    assert records == expected
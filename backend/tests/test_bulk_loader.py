@@ -0,0 +1,16 @@
+from bulk_loader import CsvRowStream, prepare_row
+
+
+def test_blank_vendor_is_stored_as_null():
+    assert prepare_row({'sku': 'TR-1', 'vendor': '  '})['vendor'] is None
+    assert prepare_row({'sku': 'TR-1'})['vendor'] is None
+    assert prepare_row({'sku': 'TR-1', 'vendor': ' Automann '})['vendor'] == 'Automann'
+
+
+def test_blank_and_missing_vendor_hash_alike():
+    assert prepare_row({'sku': 'TR-1', 'vendor': ''})['content_hash'] == prepare_row({'sku': 'TR-1'})['content_hash']
+
+
+def test_null_vendor_is_copied_as_null():
+    stream = CsvRowStream([prepare_row({'sku': 'TR-1', 'vendor': ''})], columns=['sku', 'vendor'])
+    assert stream.read() == '"TR-1",\n'
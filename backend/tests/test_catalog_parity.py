@@ -0,0 +1,177 @@
+"""The catalog store answers searches, facets and closest fits as Postgres does.
+
+The SQL side needs a Postgres database: set TEST_DATABASE_URL to one the
+tests may create a scratch schema in. Without it those tests are skipped.
+"""
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, insert, text
+
+from bulk_loader import prepare_row
+from catalog_store import CatalogSnapshot, CatalogStore, COLUMNS
+from database import Base, Product
+from facets import FACET_FIELDS, facet_predicates, facets_response
+from nearest import NearestSearch, build_nearest_query, nearest_radii, nearest_response, nearest_settled
+from search_filters import (
+    ProductSearch, build_conditions, build_count_query, build_search_query, page_response, search_predicates,
+)
+
+FIXTURE_ROWS = [
+    ('TR-100', 'Torque Rod', 'Straddle', 'Straddle', 'Rubber', 'Rubber', '15', '0', '0', '1.25', 'Automann'),
+    ('TR-101', 'Torque Rod', 'Straddle', 'Taper', 'Rubber', 'Urethane', '15 1/2', '0', '5', '1.25', 'AUTOMANN'),
+    ('TR-102', 'Torque Rod', 'Taper', 'Straddle', 'Urethane', 'Rubber', '15.75', '5', '0', '1.25', 'automann'),
+    ('TR-103', 'Torque Rod', 'Straddle', 'Straddle', 'Rubber', 'Rubber', '16', '0', '0', '1.5', 'Automann'),
+    ('TR-104', 'Torque Rod', 'Taper', 'Taper', 'Bronze', 'Bronze', '18 3/8', '10', '10', '1', 'Atro'),
+    ('TR-105', 'Torque Rod', 'straddle', 'Taper', 'Rubber', 'Bronze', '20', '0', '15', '1.25', 'Atro'),
+    ('TR-106', 'V-Rod', 'Straddle', 'Straddle', 'Rubber', None, '22', None, None, '1.25', 'Atro'),
+    ('TR-107', 'V-Rod', 'Taper', 'Straddle', None, 'Rubber', '24.5', '0', '0', None, ''),
+    ('TR-108', 'Torque Rod', 'Straddle', 'Straddle', 'Rubber', 'Rubber', 'Adj', '0', '0', '1.25', None),
+    ('TR-109', 'torque rod', 'Straddle', 'Straddle', 'Rubber', 'Rubber', '15', '0', '0', '1.25', 'Hendrickson'),
+    ('TR-110', 'Torque Rod', 'Taper', 'Straddle', 'Urethane', 'Rubber', '15', '5', '0', '1.25', 'Hendrickson'),
+    ('TR-111', 'Torque Rod', 'Straddle', 'Taper', 'Rubber', 'Urethane', '15', '0', '5', '1.25', 'Hendrickson'),
+]
+FIXTURE_FIELDS = [
+    'sku', 'type1', 'side_a', 'side_b', 'side_a_bushing', 'side_b_bushing',
+    'c_to_c', 'side_a_angle', 'side_b_angle', 'shaft_dia', 'vendor',
+]
+
+SEARCHES = [
+    ProductSearch(vendor='automann'),
+    ProductSearch(vendor='AUTOMANN', limit=2),
+    ProductSearch(vendor='automann', limit=2, cursor=2),
+    ProductSearch(side_a='straddle', side_b_bushing='rub'),
+    ProductSearch(type1='Torque Rod', c_to_c='15'),
+    ProductSearch(c_to_c='15.7'),
+    ProductSearch(c_to_c='adj'),
+    ProductSearch(c_to_c='16', c_to_c_tol=1),
+    ProductSearch(shaft_dia='1.2', count='exact'),
+    ProductSearch(side_b_angle_min=1, side_b_angle_max=10, count='exact'),
+    ProductSearch(sku='tr-10', limit=5, cursor=4),
+    ProductSearch(vendor='nobody'),
+]
+
+FACET_SEARCHES = [
+    ProductSearch(),
+    ProductSearch(vendor='automann'),
+    ProductSearch(side_a='straddle', side_a_bushing='rub'),
+    ProductSearch(c_to_c='15', side_b='taper'),
+]
+
+NEAREST_SEARCHES = [
+    NearestSearch(c_to_c='15 1/4'),
+    NearestSearch(c_to_c='15', side_a_angle='5', k=4),
+    NearestSearch(c_to_c='15', side_a='taper', k=3),
+    NearestSearch(side_b_angle='10', shaft_dia='1', k=5),
+    NearestSearch(c_to_c='20', vendor='Atro', side_b_bushing='bronze', k=2),
+]
+
+
+def fixture_rows():
+    return [prepare_row(dict(zip(FIXTURE_FIELDS, values))) for values in FIXTURE_ROWS]
+
+
+@pytest.fixture(scope='module')
+def engine():
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL not set')
+    schema = f'parity_{uuid.uuid4().hex[:8]}'
+    admin = create_engine(url, isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(url, connect_args={'options': f'-csearch_path={schema},public'})
+    try:
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Product.__table__), fixture_rows())
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+
+@pytest.fixture(scope='module')
+def store(engine):
+    store = CatalogStore()
+    store.load(engine)
+    return store
+
+
+def sql_search(engine, search_query):
+    query, params = build_search_query(search_query)
+    if query is None:
+        return None
+    with engine.connect() as conn:
+        rows = conn.execute(query, params).all()
+        total = None
+        if search_query.count:
+            count_query, count_params = build_count_query(search_query)
+            total = conn.execute(count_query, count_params).scalar()
+    return page_response(search_query, rows, total=total)
+
+
+def sql_facets(engine, search_query):
+    predicates = search_predicates(search_query)
+    counts = {}
+    with engine.connect() as conn:
+        conditions, params = build_conditions(predicates)
+        where = ' AND '.join(conditions) or 'true'
+        total = conn.execute(text(f"SELECT count(*) FROM torque_rods WHERE {where}"), params).scalar()
+        for field in FACET_FIELDS:
+            conditions, params = build_conditions(facet_predicates(predicates, field))
+            where = ' AND '.join(conditions + [f"{field} <> ''"])
+            counts[field] = [tuple(row) for row in conn.execute(text(f"""
+                SELECT min({field} COLLATE "C"), count(*) FROM torque_rods
+                WHERE {where} GROUP BY lower({field})
+            """), params)]
+    return facets_response(total, counts)
+
+
+def sql_nearest(engine, nearest_query):
+    with engine.connect() as conn:
+        for radius in nearest_radii(nearest_query):
+            query, params = build_nearest_query(nearest_query, radius)
+            rows = conn.execute(query, params).all()
+            if nearest_settled(nearest_query, rows, radius):
+                break
+    return nearest_response(rows)
+
+
+@pytest.mark.parametrize('search_query', SEARCHES, ids=repr)
+def test_search_matches_sql(engine, store, search_query):
+    assert store.search(search_query) == sql_search(engine, search_query)
+
+
+@pytest.mark.parametrize('search_query', FACET_SEARCHES, ids=repr)
+def test_facets_match_sql(engine, store, search_query):
+    expected = sql_facets(engine, search_query)
+    actual = store.facets(search_query)
+    # The store also lists values with no matching rows, which GROUP BY cannot
+    actual['facets'] = {
+        field: [facet for facet in values if facet['rows']] for field, values in actual['facets'].items()
+    }
+    assert actual == expected
+
+
+@pytest.mark.parametrize('nearest_query', NEAREST_SEARCHES, ids=repr)
+def test_nearest_matches_sql(engine, store, nearest_query):
+    def ranked(body):
+        return [(p['id'], p['flipped'], round(p['distance'], 9)) for p in body['products']]
+
+    assert ranked(store.nearest(nearest_query)) == ranked(sql_nearest(engine, nearest_query))
+
+
+def test_facet_label_is_the_least_spelling():
+    rows = [prepare_row(dict(zip(FIXTURE_FIELDS, values))) for values in FIXTURE_ROWS]
+    snapshot = CatalogSnapshot([
+        tuple(position + 1 if name == 'id' else row.get(name) for name in COLUMNS)
+        for position, row in enumerate(rows)
+    ])
+    labels = {key: label for key, label, _ in snapshot.facet_values['vendor']}
+    assert labels['automann'] == 'AUTOMANN'
+    labels = {key: label for key, label, _ in snapshot.facet_values['type1']}
+    assert labels['torque rod'] == 'Torque Rod'
@@ -0,0 +1,41 @@
+from sqlalchemy import create_engine, text
+
+from catalog_store import CatalogRefresher
+
+
+def catalog_engine(version):
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE catalog_state (id INTEGER PRIMARY KEY, version INTEGER)"))
+        conn.execute(text("INSERT INTO catalog_state VALUES (1, :version)"), {'version': version})
+    return engine
+
+
+def test_failed_callback_is_retried_before_the_version_advances():
+    calls = []
+    failures = [RuntimeError('suggestions unavailable')]
+
+    def flaky(version):
+        calls.append(version)
+        if failures:
+            raise failures.pop()
+
+    refresher = CatalogRefresher(catalog_engine(3), on_change=[flaky], version=2)
+    refresher.refresh()
+    assert calls == [3]
+    assert refresher.version == 2
+
+    refresher.refresh()
+    assert calls == [3, 3]
+    assert refresher.version == 3
+
+    refresher.refresh()
+    assert calls == [3, 3]
+
+
+def test_callbacks_run_on_the_first_refresh_without_a_version():
+    calls = []
+    refresher = CatalogRefresher(catalog_engine(5), on_change=[calls.append])
+    refresher.refresh()
+    assert calls == [5]
+    assert refresher.version == 5
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from interchange import equivalents_response
+from product_fields import fit_key, fits
+
+# As astrobushing_processing loads it: no bushing, angle or shaft fields
+ATRO_ROW = {
+    'id': 1, 'sku': 'AB-1425', 'c_to_c': '14.25', 'side_a': 'Straddle', 'side_b': 'Taper',
+    'vendor': 'AtroBushing',
+}
+# As scraped from the Automann grid, ends listed the other way round
+AUTOMANN_ROW = {
+    'id': 2, 'sku': 'TR10000', 'type1': 'With Bushing', 'c_to_c': '14 1/4"',
+    'side_a': 'Taper', 'side_b': 'Straddle', 'side_a_bushing': 'Rubber', 'side_b_bushing': 'Urethane',
+    'side_a_angle': '0°', 'side_b_angle': '15°', 'shaft_dia': '1 1/4"', 'vendor': 'Automann',
+}
+
+
+def test_atro_and_automann_rows_share_a_fit_key():
+    assert fit_key(ATRO_ROW) is not None
+    assert fit_key(ATRO_ROW) == fit_key(AUTOMANN_ROW)
+    assert fits(ATRO_ROW, AUTOMANN_ROW)
+    assert fits(AUTOMANN_ROW, ATRO_ROW)
+
+
+def test_listed_fields_must_agree():
+    other = dict(AUTOMANN_ROW, id=3, sku='TR10001', side_b_bushing='Rubber', vendor='Other')
+    assert fit_key(other) == fit_key(AUTOMANN_ROW)
+    assert not fits(AUTOMANN_ROW, other)
+    assert fits(ATRO_ROW, other)
+
+
+def test_different_sides_do_not_match():
+    assert fit_key(dict(ATRO_ROW, side_b='Hollow')) != fit_key(AUTOMANN_ROW)
+    assert fit_key(dict(ATRO_ROW, c_to_c='14.5')) != fit_key(AUTOMANN_ROW)
+
+
+def test_equivalents_across_vendors():
+    products = [ATRO_ROW, AUTOMANN_ROW]
+    rows = [SimpleNamespace(id=1, vendor='AtroBushing', sku='AB-1425', products=products)]
+    response = equivalents_response('ab-1425', rows)
+    assert [member['sku'] for member in response['equivalents']] == ['TR10000']
@@ -0,0 +1,75 @@
+from search_filters import (
+    EPSILON, ProductSearch, build_conditions, build_search_query, page_response, search_predicates,
+)
+
+
+def test_equals_and_contains_fields():
+    predicates = search_predicates(ProductSearch(side_a='Straddle', side_a_bushing='Rubber', vendor='AUTOMANN'))
+    assert predicates == (
+        ('text', 'side_a', 'equals', 'straddle'),
+        ('text', 'side_a_bushing', 'contains', 'rubber'),
+        ('text', 'vendor', 'equals', 'automann'),
+    )
+
+    conditions, params = build_conditions(predicates)
+    assert conditions == [
+        "lower(side_a) = :side_a",
+        "side_a_bushing ILIKE :side_a_bushing",
+        "lower(vendor) = :vendor",
+    ]
+    assert params == {'side_a': 'straddle', 'side_a_bushing': '%rubber%', 'vendor': 'automann'}
+
+
+def test_partial_c_to_c_covers_the_next_unit():
+    (predicate,) = search_predicates(ProductSearch(c_to_c='15'))
+    kind, column, low, high = predicate
+    assert (kind, column, low) == ('range', 'c_to_c_num', 15.0)
+    assert high == 16.0 - EPSILON
+
+    (predicate,) = search_predicates(ProductSearch(c_to_c='15.5'))
+    assert predicate[2] == 15.5
+    assert abs(predicate[3] - (15.6 - EPSILON)) < 1e-9
+
+
+def test_c_to_c_tolerance_and_text_fallback():
+    assert search_predicates(ProductSearch(c_to_c='20', c_to_c_tol=0.5)) == (
+        ('range', 'c_to_c_num', 19.5, 20.5),
+    )
+    # Not a measurement, so it's matched as text
+    assert search_predicates(ProductSearch(c_to_c='Adj')) == (('text', 'c_to_c', 'prefix', 'adj'),)
+    conditions, params = build_conditions(search_predicates(ProductSearch(c_to_c='Adj')))
+    assert conditions == ["lower(c_to_c) LIKE :c_to_c"]
+    assert params == {'c_to_c': 'adj%'}
+
+
+def test_no_fields_builds_no_query():
+    assert build_search_query(ProductSearch()) == (None, {})
+
+
+def test_cursor_continues_after_the_last_id():
+    query, params = build_search_query(ProductSearch(vendor='Automann', limit=2, cursor=40))
+    assert "id > :cursor" in str(query)
+    assert "ORDER BY id" in str(query)
+    # One lookahead row decides whether another page follows
+    assert params == {'vendor': 'automann', 'cursor': 40, 'limit': 3}
+
+
+def test_pages_chain_through_next_cursor():
+    ids = [3, 8, 9, 15, 21]
+    search_query = ProductSearch(vendor='Automann', limit=2)
+    pages = []
+    while True:
+        after = [id for id in ids if search_query.cursor is None or id > search_query.cursor]
+        rows = [(id, f'SKU{id}') for id in after[:search_query.limit + 1]]
+        page = page_response(search_query, rows)
+        pages.append([product['id'] for product in page['products']])
+        if page['next_cursor'] is None:
+            break
+        search_query = search_query.model_copy(update={'cursor': page['next_cursor']})
+    assert pages == [[3, 8], [9, 15], [21]]
+
+
+def test_counted_page_reports_its_total():
+    page = page_response(ProductSearch(vendor='x', limit=2, count='approximate'), [(1,), (2,)], 7, True)
+    assert page['next_cursor'] is None
+    assert (page['total'], page['total_is_estimate']) == (7, True)
@@ -0,0 +1,42 @@
+import asyncio
+
+from single_flight import Flight, SingleFlight
+
+
+async def never():
+    await asyncio.Event().wait()
+
+
+def test_cancel_hook_only_fires_inside_the_block():
+    cancels = []
+
+    async def main():
+        flights = SingleFlight(enabled=True)
+        left_block = asyncio.Event()
+
+        async def work(flight):
+            with flight.cancelling(lambda: cancels.append(flight.key)):
+                pass
+            left_block.set()
+            # Still running after the connection would be back in the pool
+            await never()
+
+        disconnect = asyncio.Event()
+        waiter = asyncio.ensure_future(flights.run('k', work, disconnect.wait))
+        await left_block.wait()
+        disconnect.set()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(main())
+    assert cancels == []
+
+
+def test_abandoned_flight_cancels_running_work():
+    loop = asyncio.new_event_loop()
+    flight = Flight('k')
+    flight.task = loop.create_future()
+    cancels = []
+    with flight.cancelling(lambda: cancels.append(1)):
+        flight.cancel()
+    loop.close()
+    assert cancels == [1]
@@ -1,14 +1,18 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 
 const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
+// Free-text inputs completed from /api/suggest
+const suggestFields = ['sku', 'type2', 'side_a_bushing', 'side_b_bushing'];
+
 interface ProductInterface {
     sku?: string;
     type1?: string;
     type2?: string;
     c_to_c?: string;
+    c_to_c_tol?: number;
     side_a?: string;
     side_b?: string;
     side_a_bushing?: string;
@@ -26,8 +30,25 @@ interface SearchResult extends ProductInterface {
   id: number;
 }
 
+interface FacetValue {
+  value: string;
+  rows?: number;
+}
+
+// Offered without counts while the API can't count facets (its catalog
+// store isn't loaded)
+const FALLBACK_FACETS: Record<string, FacetValue[]> = {
+  type1: ['With Bushing', 'Full Ball', 'Cabin'].map(value => ({ value })),
+  side_a: ['Sleeve', 'Taper', 'Hollow', 'Straddle Off', 'N/A', '4864', 'Straddle'].map(value => ({ value })),
+  side_b: ['Straddle', '4865', 'Sleeve', 'Taper', 'Hollow', 'N/A'].map(value => ({ value })),
+  vendor: ['Automann', 'AtroBushing'].map(value => ({ value })),
+};
+
 export default function Home() {
   const [results, setResults] = useState<SearchResult[]>([]);
+  const [total, setTotal] = useState(0);
+  const [totalIsEstimate, setTotalIsEstimate] = useState(false);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [formData, setFormData] = useState<ProductInterface>({
@@ -35,6 +56,7 @@ export default function Home() {
     type1: '',
     type2: '',
     c_to_c: '',
+    c_to_c_tol: undefined,
     side_a: '',
     side_b: '',
     side_a_bushing: '',
@@ -46,12 +68,55 @@ export default function Home() {
     vendor: ''
   });
 
+  const [facets, setFacets] = useState<Record<string, FacetValue[]>>(FALLBACK_FACETS);
+  const [suggestions, setSuggestions] = useState<Record<string, string[]>>({});
+  const suggestTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+  // The "Load more" request in flight, if any; a new search aborts it
+  const loadMoreController = useRef<AbortController | null>(null);
+
+  const fetchSuggestions = (field: string, prefix: string) => {
+    if (suggestTimer.current) {
+      clearTimeout(suggestTimer.current);
+    }
+    if (!prefix) {
+      setSuggestions(prev => ({ ...prev, [field]: [] }));
+      return;
+    }
+    suggestTimer.current = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ field, prefix });
+        const response = await fetch(`${apiUrl}/api/suggest?${params}`);
+        if (!response.ok) {
+          return;
+        }
+        const data = await response.json();
+        setSuggestions(prev => ({
+          ...prev,
+          [field]: data.suggestions.map((suggestion: { value: string }) => suggestion.value)
+        }));
+      } catch {
+        // Completions are a convenience; the search itself still runs
+      }
+    }, 100);
+  };
+
+  const suggestionList = (field: string) => (
+    <datalist id={`${field}-suggestions`}>
+      {(suggestions[field] ?? []).map((value) => (
+        <option key={value} value={value} />
+      ))}
+    </datalist>
+  );
+
   const handleInputChange = (e: React.ChangeEvent<HTMLInputElement | HTMLSelectElement>) => {
     const { name, value, type } = e.target;
     setFormData(prev => ({
       ...prev,
       [name]: type === 'number' ? (value ? Number(value) : undefined) : value
     }));
+    if (suggestFields.includes(name)) {
+      fetchSuggestions(name, value);
+    }
   };
 
   const handleClear = () => {
@@ -60,6 +125,7 @@ export default function Home() {
       type1: '',
       type2: '',
       c_to_c: '',
+      c_to_c_tol: undefined,
       side_a: '',
       side_b: '',
       side_a_bushing: '',
@@ -73,6 +139,9 @@ export default function Home() {
   };
 
   useEffect(() => {
+    // A page of the previous search must not be appended to this one
+    loadMoreController.current?.abort();
+    const controller = new AbortController();
     const searchProducts = async () => {
       try {
         setLoading(true);
@@ -91,7 +160,9 @@ export default function Home() {
           headers: {
             'Content-Type': 'application/json',
           },
-          body: JSON.stringify(formData)
+          // The planner's estimate, not a count(*) per keystroke; "Load more" asks for none
+          body: JSON.stringify({ ...formData, count: 'approximate' }),
+          signal: controller.signal
         });        
         if (!response.ok) {
           throw new Error('Failed to fetch results');
@@ -99,11 +170,24 @@ export default function Home() {
 
         const data = await response.json();
         setResults(data.products);
+        // A single page holds every match, so its length is the exact count
+        const complete = data.next_cursor == null;
+        setTotal(complete ? data.products.length : data.total ?? 0);
+        setTotalIsEstimate(!complete && Boolean(data.total_is_estimate));
+        setNextCursor(data.next_cursor ?? null);
       } catch (err) {
+        // Superseded by a newer search, which now owns the results
+        if (controller.signal.aborted) {
+          return;
+        }
         setError(err instanceof Error ? err.message : 'An error occurred');
         setResults([]);
+        setTotal(0);
+        setNextCursor(null);
       } finally {
-        setLoading(false);
+        if (!controller.signal.aborted) {
+          setLoading(false);
+        }
       }
     };
 
@@ -111,10 +195,89 @@ export default function Home() {
     const timeoutId = setTimeout(searchProducts, 300);
 
     // Cleanup function to cancel the timeout if the component unmounts
-    // or if formData changes before the timeout completes
-    return () => clearTimeout(timeoutId);
+    // or if formData changes before the timeout completes, and to drop a
+    // search still in flight so the server can cancel its query
+    return () => {
+      clearTimeout(timeoutId);
+      controller.abort();
+    };
   }, [formData]); // Run effect when formData changes
 
+  useEffect(() => {
+    const controller = new AbortController();
+    const loadFacets = async () => {
+      try {
+        const response = await fetch(`${apiUrl}/api/products/facets`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify(formData),
+          signal: controller.signal
+        });
+        if (!response.ok) {
+          setFacets(FALLBACK_FACETS);
+          return;
+        }
+        const data = await response.json();
+        setFacets(data.facets);
+      } catch {
+        // Keep the previous options; the search reports connection errors
+      }
+    };
+
+    // Counts follow the same debounce as the search
+    const timeoutId = setTimeout(loadFacets, 300);
+    return () => {
+      clearTimeout(timeoutId);
+      controller.abort();
+    };
+  }, [formData]);
+
+  // Dropdown options with their counts under the other filters; values
+  // with no matching rows stay visible but can't be picked
+  const facetOptions = (field: keyof ProductInterface) => {
+    const selected = String(formData[field] ?? '');
+    const values = facets[field] ?? [];
+    const options = selected && !values.some(facet => facet.value === selected)
+      ? [{ value: selected, rows: facets === FALLBACK_FACETS ? undefined : 0 }, ...values]
+      : values;
+    return options.map((facet) => (
+      <option key={facet.value} value={facet.value} disabled={facet.rows === 0 && facet.value !== selected}>
+        {facet.rows === undefined ? facet.value : `${facet.value} (${facet.rows})`}
+      </option>
+    ));
+  };
+
+  const handleLoadMore = async () => {
+    loadMoreController.current?.abort();
+    const controller = new AbortController();
+    loadMoreController.current = controller;
+    try {
+      const response = await fetch(`${apiUrl}/api/products/search`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ ...formData, cursor: nextCursor }),
+        signal: controller.signal
+      });
+      if (!response.ok) {
+        throw new Error('Failed to fetch results');
+      }
+
+      const data = await response.json();
+      setResults(prev => [...prev, ...data.products]);
+      setNextCursor(data.next_cursor ?? null);
+    } catch (err) {
+      // Superseded by a new search, which now owns the results
+      if (controller.signal.aborted) {
+        return;
+      }
+      setError(err instanceof Error ? err.message : 'An error occurred');
+    }
+  };
+
   return (
     <div className="min-h-screen p-8">
       <main className="max-w-4xl mx-auto">
@@ -137,9 +300,12 @@ export default function Home() {
               name="sku"
               className="w-full p-2 border rounded-md"
               placeholder="Enter SKU"
+              list="sku-suggestions"
+              autoComplete="off"
               value={formData.sku}
               onChange={handleInputChange}
             />
+            {suggestionList('sku')}
           </div>
 
           <div className="space-y-2">
@@ -152,9 +318,7 @@ export default function Home() {
               onChange={handleInputChange}
             >
               <option value="">Select Type 1</option>
-              <option value="With Bushing">With Bushing</option>
-              <option value="Full Ball">Full Ball</option>
-              <option value="Cabin">Cabin</option>
+              {facetOptions('type1')}
             </select>
           </div>
 
@@ -166,9 +330,12 @@ export default function Home() {
               name="type2"
               className="w-full p-2 border rounded-md"
               placeholder="Enter Type 2"
+              list="type2-suggestions"
+              autoComplete="off"
               value={formData.type2}
               onChange={handleInputChange}
             />
+            {suggestionList('type2')}
           </div>}
 
           <div className="space-y-2">
@@ -184,6 +351,21 @@ export default function Home() {
             />
           </div>
 
+          <div className="space-y-2">
+            <label htmlFor="c_to_c_tol" className="block text-sm font-medium">Center to Center Tolerance (±)</label>
+            <input
+              type="number"
+              step="0.0625"
+              min="0"
+              id="c_to_c_tol"
+              name="c_to_c_tol"
+              className="w-full p-2 border rounded-md"
+              placeholder="Exact"
+              value={formData.c_to_c_tol ?? ''}
+              onChange={handleInputChange}
+            />
+          </div>
+
           <div className="space-y-2">
             <label htmlFor="side_a" className="block text-sm font-medium">Side A</label>
             <select
@@ -194,13 +376,7 @@ export default function Home() {
               onChange={handleInputChange}
             >
               <option value="">Select Side A</option>
-              <option value="Sleeve">Sleeve</option>
-              <option value="Taper">Taper</option>
-              <option value="Hollow">Hollow</option>
-              <option value="Straddle Off">Straddle Off</option>
-              <option value="N/A">N/A</option>
-              <option value="4864">4864</option>
-              <option value="Straddle">Straddle</option>
+              {facetOptions('side_a')}
             </select>
           </div>
 
@@ -214,12 +390,7 @@ export default function Home() {
               onChange={handleInputChange}
             >
               <option value="">Select Side B</option>
-              <option value="Straddle">Straddle</option>
-              <option value="4865">4865</option>
-              <option value="Sleeve">Sleeve</option>
-              <option value="Taper">Taper</option>
-              <option value="Hollow">Hollow</option>
-              <option value="N/A">N/A</option>
+              {facetOptions('side_b')}
             </select>
           </div>
 
@@ -231,9 +402,12 @@ export default function Home() {
               name="side_a_bushing"
               className="w-full p-2 border rounded-md"
               placeholder="Enter Side A Bushing"
+              list="side_a_bushing-suggestions"
+              autoComplete="off"
               value={formData.side_a_bushing}
               onChange={handleInputChange}
             />
+            {suggestionList('side_a_bushing')}
           </div>}
 
           {formData.vendor !== 'AtroBushing' && <div className="space-y-2">
@@ -244,9 +418,12 @@ export default function Home() {
               name="side_b_bushing"
               className="w-full p-2 border rounded-md"
               placeholder="Enter Side B Bushing"
+              list="side_b_bushing-suggestions"
+              autoComplete="off"
               value={formData.side_b_bushing}
               onChange={handleInputChange}
             />
+            {suggestionList('side_b_bushing')}
           </div>}
 
           {formData.vendor !== 'AtroBushing' && <div className="space-y-2">
@@ -298,14 +475,13 @@ export default function Home() {
               onChange={handleInputChange}
             >
               <option value="">Select Vendor</option>
-              <option value="Automann">Automann</option>
-              <option value="AtroBushing">AtroBushing</option>
+              {facetOptions('vendor')}
             </select>
           </div>
         </form>
 
         <div className="mt-8">
-          <h2 className="text-2xl font-semibold mb-4">{results?.length && results.length > 0 ? results.length + ' Results' : 'No results'}</h2>
+          <h2 className="text-2xl font-semibold mb-4">{results.length === 0 ? 'No results' : (totalIsEstimate ? 'About ' : '') + total + ' Results'}</h2>
           <div className="border rounded-md p-4">
             {error && (
               <p className="text-red-500">{error}</p>
@@ -331,6 +507,15 @@ export default function Home() {
                     </div>
                   </div>
                 ))}
+                {nextCursor !== null && (
+                  <button
+                    type="button"
+                    onClick={handleLoadMore}
+                    className="w-full px-4 py-2 bg-gray-200 text-gray-700 rounded-md hover:bg-gray-300 transition-colors"
+                  >
+                    Load more
+                  </button>
+                )}
               </div>
             ) : (
               <p className="text-gray-500">No results found. Try adjusting your search criteria.</p>